@@ -42,10 +42,7 @@ def get_everything_for_run_selection(
     with open(input_file_path, 'r') as f:
         input_data = json.load(f)
 
-    with open(route_file_path, 'r') as f:
-        routes_data = json.load(f)
-
-    environment: Environment = get_env(input_data, routes_data)
+    environment: Environment = get_env(input_data, route_file_path)
     simulator = Simulator()
     requests_constrains = get_requests_constrains(environment, False)
     return environment, simulator, requests_constrains
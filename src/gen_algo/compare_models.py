@@ -20,6 +20,7 @@ from src.optimizer.settings import GENERATOR_SETTINGS
 from src.simulator.builder import get_env, get_requests_constraints
 from src.simulator.model.simulator import Simulator
 from src.simulator.utils.data_generator.generator import InputDataGenerator
+from src.simulator.utils.hashing import hash_file
 
 ALGORITHM_NAMES = (
     "ga",
@@ -69,8 +70,10 @@ def build_generator(seed: int | None = None) -> InputDataGenerator:
     )
 
 
-def build_fixed_test_instances(count: int, seed: int) -> list[tuple[dict, list[dict]]]:
-    return build_generator(seed=seed).generate_many(count)
+def build_fixed_test_instances(count: int, seed: int) -> list[tuple[dict, str]]:
+    # Маршруты у всех инстансов из файла генератора - в воркеры уходит путь, сеть берется из кэша рядом с ним
+    generator = build_generator(seed=seed)
+    return [(input_data, generator.routes_file_path) for input_data, _ in generator.generate_many(count)]
 
 
 def _seed_everything(seed: int) -> None:
@@ -153,7 +156,8 @@ def run_single_algorithm(
     algorithm: str,
     instance_id: int,
     input_data: dict,
-    routes_data: list[dict],
+    routes_file_path: str,
+    routes_sha256: str,
     model_path: Path,
     ga_iterations: int,
     population_size: int,
@@ -164,7 +168,7 @@ def run_single_algorithm(
     _seed_everything(seed)
     print(f"Запустили {instance_id} для {algorithm}")
 
-    environment = get_env(input_data, routes_data)
+    environment = get_env(input_data, routes_file_path, routes_sha256)
     requests_constraints = get_requests_constraints(environment, with_missed=True)
     simulator = Simulator(environment)
 
@@ -194,15 +198,21 @@ def run_single_algorithm(
 def evaluate_algorithms(config: ComparisonConfig) -> list[AlgorithmRunResult]:
     fixed_instances = build_fixed_test_instances(config.test_instances, config.test_seed)
 
+    routes_hashes = {
+        routes_file_path: hash_file(routes_file_path)
+        for routes_file_path in {routes_file_path for _, routes_file_path in fixed_instances}
+    }
+
     jobs = []
-    for instance_id, (input_data, routes_data) in enumerate(fixed_instances):
+    for instance_id, (input_data, routes_file_path) in enumerate(fixed_instances):
         for algorithm_id, algorithm in enumerate(ALGORITHM_NAMES):
             jobs.append(
                 (
                     algorithm,
                     instance_id,
                     input_data,
-                    routes_data,
+                    routes_file_path,
+                    routes_hashes[routes_file_path],
                     config.model_path,
                     config.ga_iterations,
                     config.population_size,
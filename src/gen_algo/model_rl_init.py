@@ -39,10 +39,12 @@ class GeneticAlgoWithRLInit(GeneticAlgoSimple):
     ) -> "GeneticAlgoWithRLInit":
         observation_feature_config = cls._load_observation_feature_config(model_path)
         rl_model = MaskablePPO.load(str(model_path))
+        # Наблюдение сразу уходит в predict, поэтому буферы можно не копировать
         obs_builder = ObservationBuilder(
             environment,
-            requests_constrains,
+            environment.constraints,
             observation_feature_config,
+            return_views=True,
         )
         return cls(
             simulator=simulator,
@@ -1,5 +1,7 @@
 import random
 
+import numpy as np
+
 from src.gen_algo.base import GeneticAlgoBase, Genome
 from src.simulator.model.simulator import Simulator
 
@@ -18,7 +20,8 @@ class GeneticAlgoSimple(GeneticAlgoBase):
             requests_constrains: list[list[int]],
             popul_size: int = 100,
             mutation_rate: float = 0.1,
-            retain_rate: float = 0.2
+            retain_rate: float = 0.2,
+            checkpoint_stride: int = 1
     ):
         """
         :param simulator: Модель симулятора бизнесс-логики выборки машин
@@ -26,6 +29,8 @@ class GeneticAlgoSimple(GeneticAlgoBase):
         :param popul_size: Размер популяции
         :param mutation_rate: Вероятность мутации каждого гена
         :param retain_rate: Доля лучших особей, которые выживают и становятся родителями
+        :param checkpoint_stride: Шаг (в заявках) между чекпоинтами симуляции, с которых
+                продолжается оценка потомков
         """
         self._genome_length = len(requests_constrains)
         self._popul_size = popul_size
@@ -35,19 +40,42 @@ class GeneticAlgoSimple(GeneticAlgoBase):
         self._retain_rate = retain_rate
         self._simulator = simulator
         self._requests_constrains = requests_constrains
+        assert checkpoint_stride >= 1, "Шаг между чекпоинтами должен быть >= 1"
+        self._checkpoint_stride = checkpoint_stride
+        # Чекпоинты последнего оцененного поколения и индекс особи в них
+        self._checkpoints = None
+        self._checkpoint_ids: dict[tuple[int, ...], int] = {}
+        # Родители особей следующей оцениваемой популяции, с которыми у особи общий префикс генов
+        # (заполняется в fit, None - популяция оценивается с нуля)
+        self._prefix_parents: list[Genome] | None = None
 
     def _create_initial_population(self) -> list[Genome]:
         """Создает начальную популяцию из случайных индексов машин."""
         return [[random.choice(self._requests_constrains[i]) for i in range(self._genome_length)] for _ in range(self._popul_size)]
 
-    def _fitness_function(self, individual: Genome) -> int:
-        """Целевая функция: считаем количество выполненных заявок."""
-        missed_requests_ids, _, _ = self._simulator.run(tuple(individual))
-        return self._genome_length - len(missed_requests_ids)
-
     def _evaluate_population(self, population: list[Genome]) -> list[int]:
-        """Оценивает всю популяцию."""
-        return [self._fitness_function(ind) for ind in population]
+        """Оценивает всю популяцию одним векторизованным прогоном симулятора
+        (приспособленность - количество выполненных заявок).
+
+        Если для особи известен родитель из прошлого поколения, с которым у нее общий префикс,
+        то симуляция продолжается с его чекпоинта и считается только хвост хромосомы.
+        """
+        parent_ids = None
+        prefix_parents, self._prefix_parents = self._prefix_parents, None
+        if prefix_parents is not None and self._checkpoints is not None:
+            assert len(prefix_parents) == len(population), "Родители заданы не для всей популяции"
+            parent_ids = np.array(
+                [self._checkpoint_ids.get(tuple(parent), -1) for parent in prefix_parents], dtype=np.int64
+            )
+
+        missed_requests_nums, self._checkpoints = self._simulator.run_batch_with_checkpoints(
+            np.array(population, dtype=np.int64),
+            checkpoint_stride=self._checkpoint_stride,
+            parent_checkpoints=self._checkpoints if parent_ids is not None else None,
+            parent_ids=parent_ids
+        )
+        self._checkpoint_ids = {tuple(individual): i for i, individual in enumerate(population)}
+        return (self._genome_length - missed_requests_nums).tolist()
 
     def _selection(self, population: list[Genome], fitnesses: list[int]) -> list[Genome]:
         """Отбор лучших особей (Truncation selection)."""
@@ -81,6 +109,7 @@ class GeneticAlgoSimple(GeneticAlgoBase):
     def fit(self, iterations: int) -> Genome:
         """Основной цикл эволюции."""
         population = self._create_initial_population()
+        self._prefix_parents = None
 
         for iter in range(iterations):
             # 1. Оценка текущего поколения
@@ -95,9 +124,11 @@ class GeneticAlgoSimple(GeneticAlgoBase):
 
             # 3. Формирование нового поколения
             next_generation = []
+            prefix_parents = []
 
             # Элитизм: гарантированно переносим лучшую особь в следующее поколение
             next_generation.append(best_individual)
+            prefix_parents.append(best_individual)
 
             # 4. Скрещивание и мутация для заполнения остальной популяции
             while len(next_generation) < self._popul_size:
@@ -107,10 +138,14 @@ class GeneticAlgoSimple(GeneticAlgoBase):
                 c1, c2 = self._crossover(p1, p2)
 
                 next_generation.append(self._mutation(c1))
+                prefix_parents.append(p1)
                 if len(next_generation) < self._popul_size:
                     next_generation.append(self._mutation(c2))
+                    prefix_parents.append(p2)
 
             population = next_generation
+            # Родитель, с которым у особи общий префикс генов (потомок продолжает его симуляцию)
+            self._prefix_parents = prefix_parents
 
         # Оценка последнего поколения после завершения цикла
         final_fitnesses = self._evaluate_population(population)
@@ -0,0 +1,47 @@
+import argparse
+import time
+
+from src.optimizer.settings import DEFAULT_OBSERVATION_FEATURES
+from src.optimizer.train import build_generator
+from src.optimizer.main import SimulatorEnv
+
+
+def measure_reset_latency(trusted_input: bool, resets: int, seed: int | None) -> float:
+    """ Среднее время SimulatorEnv.reset в секундах на одних и тех же сгенерированных инстансах
+
+    :param trusted_input: Собирать Environment без валидации pydantic
+    :param resets: Кол-во замеряемых reset
+    :param seed: Seed генератора
+    """
+    env = SimulatorEnv(build_generator(seed=seed), DEFAULT_OBSERVATION_FEATURES, trusted_input=trusted_input)
+    # Первый reset прогревает кэши маршрутов и матриц расстояний
+    env.reset(seed=seed)
+    total_time = 0.0
+    for _ in range(resets):
+        start_time = time.perf_counter()
+        env.reset()
+        total_time += time.perf_counter() - start_time
+    return total_time / resets
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure SimulatorEnv.reset latency with and without validation.")
+    parser.add_argument("--resets", type=int, default=20, help="Number of measured resets per mode.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed used by the input data generator.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    latencies = {
+        trusted_input: measure_reset_latency(trusted_input, args.resets, args.seed)
+        for trusted_input in (False, True)
+    }
+    print(f"{'mode':<12}{'reset, ms':>12}")
+    print(f"{'validated':<12}{latencies[False] * 1000:>12.1f}")
+    print(f"{'trusted':<12}{latencies[True] * 1000:>12.1f}")
+    print(f"speedup: {latencies[False] / latencies[True]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
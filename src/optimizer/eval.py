@@ -53,22 +53,26 @@ def build_generator(seed: int | None = None) -> InputDataGenerator:
         seed=seed,
     )
 
-def build_fixed_instances(count: int, seed: int | None) -> list[tuple[dict, list[dict]]]:
+def build_fixed_instances(count: int, seed: int | None) -> list[tuple[dict, str]]:
     if count <= 0:
         raise ValueError("count must be positive")
-    return build_generator(seed=seed).generate_many(count)
+    # Маршруты инстансов из файла генератора - SimulatorEnv возьмет уже разобранную сеть
+    generator = build_generator(seed=seed)
+    return [(input_data, generator.routes_file_path) for input_data, _ in generator.generate_many(count)]
 
 
 def build_env(
     observation_feature_config: ObservationFeatureConfig,
     *,
     seed: int | None = None,
-    fixed_instances: list[tuple[dict, list[dict]]] | None = None,
+    fixed_instances: list[tuple[dict, str]] | None = None,
 ) -> SimulatorEnv:
     return SimulatorEnv(
         build_generator(seed=seed),
         observation_feature_config,
         fixed_instances=fixed_instances,
+        # Инстансы строит InputDataGenerator - валидация pydantic не нужна
+        trusted_input=True,
     )
 
 
@@ -6,10 +6,12 @@ import numpy as np
 from gymnasium import spaces
 from gymnasium.core import ObsType, ActType
 
+from src.optimizer.utils.feature_timing import FeatureTimings
 from src.optimizer.utils.observation_builder import ObservationBuilder
-from src.simulator.builder import get_env, get_requests_constraints
+from src.optimizer.utils.observation_encoding import encode_observation_space, get_quantization_scale
+from src.simulator.builder import get_env
 from src.simulator.environment import Environment
-from src.simulator.model.simulator import Simulator
+from src.simulator.model.simulator import Simulator, SimulatorSession
 from src.optimizer.settings import (
     GENERATOR_SETTINGS,
     DEFAULT_OBSERVATION_FEATURES,
@@ -23,8 +25,24 @@ class SimulatorEnv(gymnasium.Env):
             self,
             input_generator: InputDataGenerator,
             observation_feature_config: ObservationFeatureConfig = DEFAULT_OBSERVATION_FEATURES,
-            fixed_instances: list[tuple[dict, list[dict]]] | None = None,
+            fixed_instances: list[tuple[dict, list[dict] | str]] | None = None,
+            observation_views: bool = False,
+            profile_observations: bool = False,
+            trusted_input: bool = False,
     ):
+        """
+        :param input_generator: Генератор инстансов
+        :param observation_feature_config: Набор признаков наблюдения
+        :param fixed_instances: Фиксированные инстансы (вместо генерации на каждом reset),
+                маршруты - списком или путем к файлу маршрутов
+        :param observation_views: Возвращать наблюдения без копирования (буферы ObservationSession),
+                наблюдение действительно до следующего step. Подходит для VecEnv из SB3, которые
+                сами копируют наблюдения
+        :param profile_observations: Копить время сборки наблюдения по группам признаков и отдавать его
+                в info["observation_timings"] (накопленное с создания env, см. FeatureTimings.summary)
+        :param trusted_input: Инстансы заведомо корректны (выход InputDataGenerator) - Environment
+                собирается без pydantic-валидации (см. Environment.from_trusted_data)
+        """
         # Пространство действий - это id машины [0, max_truck_num-1] + [-1]
         self.action_space = spaces.Discrete(GENERATOR_SETTINGS.max_truck_num+1)
         self._observation_feature_config = observation_feature_config
@@ -32,13 +50,17 @@ class SimulatorEnv(gymnasium.Env):
 
         self._static_obs = None     # Это неизменные наблюдения (как временные окна заявок и ограничения)
         self._simulator = Simulator()
+        self._simulation_session: SimulatorSession = None
         self._current_env: Environment = None
-        self._current_requests_constrains = None
         self._generator = input_generator
         self._fixed_instances = fixed_instances or []
         self._fixed_instance_cursor = 0
+        self._observation_views = observation_views
         self._max_selection_len = -1
         self._obs_builder = None
+        self._obs_session = None
+        self._observation_timings = FeatureTimings() if profile_observations else None
+        self._trusted_input = trusted_input
 
         self._current_selection = []
         self._current_step = 1
@@ -81,6 +103,8 @@ class SimulatorEnv(gymnasium.Env):
             observation_space["lateness_to_window_start"] = spaces.Box(
                 0.0, 1.0, shape=pairwise_shape, dtype=np.float32
             )
+        if feature_config.compact_encoding:
+            observation_space = encode_observation_space(observation_space, feature_config)
         return observation_space
 
     def reset(
@@ -95,32 +119,58 @@ class SimulatorEnv(gymnasium.Env):
             if seed is not None:
                 self._fixed_instance_cursor = seed % len(self._fixed_instances)
             input_data, routes_data = copy.deepcopy(self._fixed_instances[self._fixed_instance_cursor])
+            if routes_data == self._generator.routes_file_path:
+                # Маршруты из файла генератора - берем его уже разобранную сеть
+                routes_data = self._generator.route_network
+                routes_sha256 = self._generator.routes_sha256
+            else:
+                # Маршруты фиксированных инстансов не обязательно из файла генератора
+                routes_sha256 = None
             self._fixed_instance_cursor = (self._fixed_instance_cursor + 1) % len(self._fixed_instances)
         else:
             if seed is not None:
                 self._generator.reseed(seed)
-            input_data, routes_data = self._generator.generate_all(None)
-        self._current_env: Environment = get_env(input_data, routes_data)
-        self._current_requests_constrains = get_requests_constraints(self._current_env, with_missed=True)
+            input_data, _ = self._generator.generate_all(None)
+            # Маршруты генератора всегда из его файла - берем уже разобранную сеть из бинарного кэша
+            routes_data = self._generator.route_network
+            routes_sha256 = self._generator.routes_sha256
+        self._current_env: Environment = get_env(
+            input_data, routes_data, routes_sha256, trusted=self._trusted_input
+        )
         self._obs_builder = ObservationBuilder(
             self._current_env,
-            self._current_requests_constrains,
-            self._observation_feature_config
+            self._current_env.constraints,
+            self._observation_feature_config,
+            return_views=self._observation_views,
+            timings=self._observation_timings
         )
+        # Наблюдение обновляется по шагам, а не пересобирается целиком
+        self._obs_session = self._obs_builder.start_session()
+
+        self._simulation_session = self._simulator.start_session(self._current_env)
 
         self._current_selection = []
         self._current_step = 1
 
-        observation = self._obs_builder.create_observation([], [])
+        observation = self._obs_session.reset()
         self._current_observation = observation
         info = {
             "missed_requests_num": 0,
             "unfinished_ratio": self._build_unfinished_ratio([], self._current_selection),
             "current_selection": self._current_selection
         }
+        self._add_observation_timings(info)
 
         return observation, info
 
+    @property
+    def observation_timings(self) -> FeatureTimings | None:
+        return self._observation_timings
+
+    def _add_observation_timings(self, info: dict) -> None:
+        if self._observation_timings is not None:
+            info["observation_timings"] = self._observation_timings.summary()
+
     def action_masks(self) -> np.ndarray[bool]:
         # Возвращаем любую маску при превышении лимита заявок
         if len(self._current_selection) >= self._current_env.requests_num:
@@ -135,7 +185,7 @@ class SimulatorEnv(gymnasium.Env):
 
     def _apply_restrictions_to_selection(self, selection: list[int]) -> None:
         for request_id, truck_id in enumerate(selection):
-            if truck_id not in self._current_requests_constrains[request_id]:
+            if not self._current_env.constraints.is_allowed(request_id, truck_id):
                 selection[request_id] = -1
                 print(f"Не выполнилось ограничение для заявки {request_id}! Пытались поставить {truck_id}.")
 
@@ -162,6 +212,9 @@ class SimulatorEnv(gymnasium.Env):
             float(observation_before_action["earliness_to_window_start"][0][truck_id])
             - float(observation_before_action["lateness_to_window_start"][0][truck_id])
         )
+        if self._observation_feature_config.compact_encoding:
+            # В компактной кодировке запас квантован
+            chosen_slack /= get_quantization_scale(self._observation_feature_config)
         return self._slack_penalty(chosen_slack)
 
     def _calculate_reward(
@@ -203,20 +256,12 @@ class SimulatorEnv(gymnasium.Env):
         # Применяем ограничения (по идее с маской действий эта логика не нужна)
         # self._apply_restrictions_to_selection(self._current_selection)
 
-        # Запускаем симуляцию выборки
-        missed_requests_ids, truck_positions, truck_available_times = self._simulator.run(
-            tuple(self._current_selection),
-            self._current_env
-        )
-        observation = self._obs_builder.create_observation(
-            missed_requests_ids,
-            self._current_selection,
-            truck_positions,
-            truck_available_times
+        # Досимулируем только добавленную заявку (результат совпадает с Simulator.run на всей выборке)
+        missed_requests_ids, truck_positions, truck_available_times = self._simulation_session.append(
+            self._current_selection[-1]
         )
-        self._current_observation = observation
 
-        # Считаем награду
+        # Считаем награду до обновления наблюдения (с observation_views буферы перезаписываются)
         reward = self._calculate_reward(
             action,
             observation_before_action,
@@ -224,6 +269,14 @@ class SimulatorEnv(gymnasium.Env):
             missed_requests_ids
         )
 
+        observation = self._obs_session.append(
+            self._current_selection[-1],
+            missed_requests_ids,
+            truck_positions,
+            truck_available_times
+        )
+        self._current_observation = observation
+
         # Проверяем нужно ли заканчивать предсказание
         terminated = len(self._current_selection) >= self._current_env.requests_num
 
@@ -233,5 +286,6 @@ class SimulatorEnv(gymnasium.Env):
             "unfinished_ratio": self._build_unfinished_ratio(missed_requests_ids, self._current_selection),
             "current_selection": self._current_selection
         }
+        self._add_observation_timings(info)
 
         return observation, reward, terminated, truncated, info
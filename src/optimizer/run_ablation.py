@@ -22,6 +22,7 @@ def build_train_config(
     eval_freq: int,
     verbose: int,
     early_stop_patience_episodes: int,
+    profile_observations: bool = False,
 ) -> TrainConfig:
     preset_dir = base_dir / preset
     preset_dir.mkdir(parents=True, exist_ok=True)
@@ -43,6 +44,7 @@ def build_train_config(
         verbose=verbose,
         observation_feature_config=get_observation_feature_config(preset),
         early_stop_patience_episodes=early_stop_patience_episodes,
+        profile_observations=profile_observations,
     )
 
 
@@ -142,6 +144,11 @@ def parse_args() -> argparse.Namespace:
         default=0,
         help="Stop training if unfinished_ratio does not improve for this many completed episodes. 0 disables early stopping.",
     )
+    parser.add_argument(
+        "--profile-observations",
+        action="store_true",
+        help="Log per-feature observation build time of each preset to its TensorBoard run.",
+    )
     return parser.parse_args()
 
 
@@ -163,6 +170,7 @@ def main() -> None:
             eval_freq=args.eval_freq,
             verbose=args.verbose,
             early_stop_patience_episodes=args.early_stop_patience_episodes,
+            profile_observations=args.profile_observations,
         )
         last_model_path = train(train_config)
         best_model_path = train_config.best_model_dir / "best_model.zip"
@@ -1,4 +1,5 @@
 import json
+from typing import Literal
 
 from pydantic_settings import BaseSettings
 from pydantic import Field, ConfigDict, BaseModel
@@ -36,6 +37,10 @@ class ObservationFeatureConfig(BaseModel):
     use_next_request_tw: bool = True
     use_pairwise_features: bool = True
     pairwise_lookahead_requests: int = 1
+    # Компактная кодировка: выборка в наименьшем подходящем знаковом типе, а время в долях горизонта квантуется в quantized_time_dtype
+    # (декодирование - в CompactCombinedExtractor политики)
+    compact_encoding: bool = False
+    quantized_time_dtype: Literal["uint8", "uint16"] = "uint16"
 
     model_config = ConfigDict(frozen=True)
 
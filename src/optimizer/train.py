@@ -1,5 +1,4 @@
 import argparse
-import hashlib
 import json
 from dataclasses import dataclass
 from datetime import datetime
@@ -22,7 +21,10 @@ from src.optimizer.train_pool import (
     TrainPoolEnvWrapper,
     build_train_pool_seeds,
 )
+from src.optimizer.utils.compact_policy import CompactCombinedExtractor, CompactDictRolloutBuffer
+from src.optimizer.utils.observation_encoding import get_quantization_scale
 from src.simulator.utils.data_generator.generator import InputDataGenerator
+from src.simulator.utils.hashing import hash_file
 
 OBSERVATION_PRESETS = (
     "all",
@@ -58,6 +60,7 @@ class TrainConfig:
     verbose: int
     observation_feature_config: ObservationFeatureConfig
     early_stop_patience_episodes: int
+    profile_observations: bool = False
 
 
 class EpisodeLoggerCallback(BaseCallback):
@@ -71,6 +74,10 @@ class EpisodeLoggerCallback(BaseCallback):
                 self.logger.record("episode/missed_requests_num", info["missed_requests_num"])
             if "unfinished_ratio" in info:
                 self.logger.record("episode/unfinished_ratio", float(info["unfinished_ratio"][0]))
+            # Есть только при SimulatorEnv(profile_observations=True), значения накоплены с создания env
+            for group, timing in info.get("observation_timings", {}).items():
+                self.logger.record(f"observation_timing/{group}_mean_us", timing["mean_us"])
+                self.logger.record(f"observation_timing/{group}_total_s", timing["total_s"])
         current_lr = self.model.policy.optimizer.param_groups[0]["lr"]
         self.logger.record("train/learning_rate", current_lr)
         return True
@@ -224,6 +231,8 @@ def build_generator(seed: int | None = None) -> InputDataGenerator:
 def get_observation_feature_config(
     preset: str,
     pairwise_lookahead_requests: int = 1,
+    compact_encoding: bool = False,
+    quantized_time_dtype: str = "uint16",
 ) -> ObservationFeatureConfig:
     if pairwise_lookahead_requests <= 0:
         raise ValueError("pairwise_lookahead_requests must be positive")
@@ -256,27 +265,41 @@ def get_observation_feature_config(
             }
         ),
     }
-    return presets[preset].model_copy(
-        update={"pairwise_lookahead_requests": pairwise_lookahead_requests}
+    # Через конструктор, чтобы провалидировать quantized_time_dtype
+    return ObservationFeatureConfig(
+        **{
+            **presets[preset].model_dump(),
+            "pairwise_lookahead_requests": pairwise_lookahead_requests,
+            "compact_encoding": compact_encoding,
+            "quantized_time_dtype": quantized_time_dtype,
+        }
     )
 
 
-def build_fixed_instances(count: int, seed: int | None) -> list[tuple[dict, list[dict]]]:
+def build_fixed_instances(count: int, seed: int | None) -> list[tuple[dict, str]]:
     if count <= 0:
         raise ValueError("count must be positive")
-    return build_generator(seed=seed).generate_many(count)
+    # Маршруты инстансов из файла генератора - SimulatorEnv возьмет уже разобранную сеть
+    generator = build_generator(seed=seed)
+    return [(input_data, generator.routes_file_path) for input_data, _ in generator.generate_many(count)]
 
 
 def build_env(
     observation_feature_config: ObservationFeatureConfig,
     *,
     seed: int | None = None,
-    fixed_instances: list[tuple[dict, list[dict]]] | None = None,
+    fixed_instances: list[tuple[dict, str]] | None = None,
+    profile_observations: bool = False,
 ) -> SimulatorEnv:
     return SimulatorEnv(
         build_generator(seed=seed),
         observation_feature_config,
         fixed_instances=fixed_instances,
+        # VecEnv из SB3 копирует наблюдения в свои буферы
+        observation_views=True,
+        # Инстансы строит InputDataGenerator - валидация pydantic не нужна
+        trusted_input=True,
+        profile_observations=profile_observations,
     )
 
 
@@ -286,17 +309,6 @@ def ensure_output_dirs(config: TrainConfig) -> None:
     config.tensorboard_dir.mkdir(parents=True, exist_ok=True)
 
 
-def _hash_file(file_path: Path) -> str:
-    digest = hashlib.sha256()
-    with file_path.open("rb") as f:
-        while True:
-            chunk = f.read(8192)
-            if not chunk:
-                break
-            digest.update(chunk)
-    return digest.hexdigest()
-
-
 def serialize_train_config(config: TrainConfig) -> dict:
     return {
         "total_timesteps": config.total_timesteps,
@@ -320,6 +332,7 @@ def serialize_train_config(config: TrainConfig) -> dict:
         "verbose": config.verbose,
         "observation_feature_config": config.observation_feature_config.model_dump(),
         "early_stop_patience_episodes": config.early_stop_patience_episodes,
+        "profile_observations": config.profile_observations,
     }
 
 
@@ -332,7 +345,7 @@ def build_training_metadata(config: TrainConfig) -> dict:
         "generator_settings": json.loads(generator_settings_path.read_text()),
         "routes": {
             "path": str(routes_path),
-            "sha256": _hash_file(routes_path),
+            "sha256": hash_file(routes_path),
         },
     }
 
@@ -346,6 +359,17 @@ def save_training_metadata(model_path: Path, config: TrainConfig) -> Path:
 
 
 def build_model(config: TrainConfig, env: SimulatorEnv) -> MaskablePPO:
+    policy_kwargs = {
+        "net_arch": config.net_arch,
+    }
+    rollout_buffer_class = None
+    if config.observation_feature_config.compact_encoding:
+        # Квантованные признаки декодируются в политике, а роллауты хранятся в компактных типах
+        policy_kwargs["features_extractor_class"] = CompactCombinedExtractor
+        policy_kwargs["features_extractor_kwargs"] = {
+            "quantization_scale": get_quantization_scale(config.observation_feature_config),
+        }
+        rollout_buffer_class = CompactDictRolloutBuffer
     return MaskablePPO(
         "MultiInputPolicy",
         env,
@@ -355,9 +379,8 @@ def build_model(config: TrainConfig, env: SimulatorEnv) -> MaskablePPO:
         verbose=config.verbose,
         tensorboard_log=str(config.tensorboard_dir),
         seed=config.seed,
-        policy_kwargs={
-            "net_arch": config.net_arch,
-        },
+        policy_kwargs=policy_kwargs,
+        rollout_buffer_class=rollout_buffer_class,
     )
 
 
@@ -381,7 +404,11 @@ def train(config: TrainConfig) -> Path:
         fresh_seed=None if config.seed is None else config.seed + 10_000,
     )
     train_env = TrainPoolEnvWrapper(
-        build_env(config.observation_feature_config, seed=config.seed),
+        build_env(
+            config.observation_feature_config,
+            seed=config.seed,
+            profile_observations=config.profile_observations,
+        ),
         train_sampler,
     )
     eval_seed = None if config.seed is None else config.seed + 1
@@ -544,6 +571,17 @@ def parse_args() -> TrainConfig:
         default=1,
         help="How many future requests to encode in pairwise truck-request features.",
     )
+    parser.add_argument(
+        "--compact-observations",
+        action="store_true",
+        help="Encode observations with small-int dtypes and quantized times (decoded in the policy).",
+    )
+    parser.add_argument(
+        "--quantized-time-dtype",
+        choices=("uint8", "uint16"),
+        default="uint16",
+        help="Integer dtype for quantized normalized times in compact observations.",
+    )
     parser.add_argument(
         "--early-stop-patience-episodes",
         "--early-stop-patience-epochs",
@@ -552,6 +590,11 @@ def parse_args() -> TrainConfig:
         default=0,
         help="Stop training if unfinished_ratio does not improve for this many completed episodes. 0 disables early stopping.",
     )
+    parser.add_argument(
+        "--profile-observations",
+        action="store_true",
+        help="Log per-feature observation build time (observation_timing/*) to TensorBoard.",
+    )
     args = parser.parse_args()
 
     return TrainConfig(
@@ -577,8 +620,11 @@ def parse_args() -> TrainConfig:
         observation_feature_config=get_observation_feature_config(
             args.observation_preset,
             pairwise_lookahead_requests=args.pairwise_lookahead_requests,
+            compact_encoding=args.compact_observations,
+            quantized_time_dtype=args.quantized_time_dtype,
         ),
         early_stop_patience_episodes=args.early_stop_patience_episodes,
+        profile_observations=args.profile_observations,
     )
 
 
@@ -0,0 +1,54 @@
+import numpy as np
+import torch as th
+from gymnasium import spaces
+from sb3_contrib.common.maskable.buffers import MaskableDictRolloutBuffer
+from stable_baselines3.common.torch_layers import CombinedExtractor
+
+from src.optimizer.utils.observation_encoding import QUANTIZED_KEYS
+
+
+class CompactCombinedExtractor(CombinedExtractor):
+    """ CombinedExtractor для компактной кодировки наблюдений (ObservationFeatureConfig.compact_encoding)
+
+        Квантованные признаки приходят целыми [0, quantization_scale] и переводятся обратно в доли горизонта
+        уже внутри политики, поэтому в буферах и между процессами лежат компактные типы.
+    """
+
+    def __init__(
+            self,
+            observation_space: spaces.Dict,
+            quantization_scale: int,
+            cnn_output_dim: int = 256,
+            normalized_image: bool = False
+    ):
+        super().__init__(observation_space, cnn_output_dim=cnn_output_dim, normalized_image=normalized_image)
+        self._quantized_keys = [key for key in QUANTIZED_KEYS if key in observation_space.spaces]
+        self._quantization_scale = float(quantization_scale)
+
+    def forward(self, observations: dict[str, th.Tensor]) -> th.Tensor:
+        observations = dict(observations)
+        for key in self._quantized_keys:
+            observations[key] = observations[key].float() / self._quantization_scale
+        return super().forward(observations)
+
+
+class CompactDictRolloutBuffer(MaskableDictRolloutBuffer):
+    """ Буфер роллаутов, который хранит наблюдения в типах их пространств
+
+        MaskableDictRolloutBuffer хранит все наблюдения во float32, и компактная кодировка
+        не уменьшала бы память роллаутов.
+    """
+
+    def reset(self) -> None:
+        # Родительский reset заводит float32 буфер под каждый ключ obs_shape - прячем ключи на время
+        # его вызова, чтобы под наблюдения выделялись только компактные буферы
+        obs_shape, self.obs_shape = self.obs_shape, {}
+        try:
+            super().reset()
+        finally:
+            self.obs_shape = obs_shape
+        for key, obs_input_shape in self.obs_shape.items():
+            self.observations[key] = np.zeros(
+                (self.buffer_size, self.n_envs, *obs_input_shape),
+                dtype=self.observation_space.spaces[key].dtype
+            )
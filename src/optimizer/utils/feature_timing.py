@@ -0,0 +1,39 @@
+from time import perf_counter
+
+
+class FeatureTimings:
+    """ Накопленное время и кол-во вызовов сборки наблюдения по группам признаков
+
+        Замеры идут подряд: start() перед первой группой, затем lap(group) после каждой -
+        время группы отсчитывается от предыдущей отметки. Значения копятся между эпизодами
+        до reset(), поэтому один объект можно передавать в каждый новый ObservationBuilder.
+    """
+
+    def __init__(self):
+        self._seconds: dict[str, float] = {}
+        self._calls: dict[str, int] = {}
+        self._lap_start = 0.0
+
+    def start(self) -> None:
+        self._lap_start = perf_counter()
+
+    def lap(self, group: str) -> None:
+        now = perf_counter()
+        self._seconds[group] = self._seconds.get(group, 0.0) + (now - self._lap_start)
+        self._calls[group] = self._calls.get(group, 0) + 1
+        self._lap_start = now
+
+    def reset(self) -> None:
+        self._seconds.clear()
+        self._calls.clear()
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """ {группа: {"total_s": суммарное время, "calls": кол-во вызовов, "mean_us": среднее на вызов}} """
+        return {
+            group: {
+                "total_s": seconds,
+                "calls": self._calls[group],
+                "mean_us": seconds / self._calls[group] * 1e6,
+            }
+            for group, seconds in self._seconds.items()
+        }
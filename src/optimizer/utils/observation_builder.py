@@ -2,275 +2,281 @@ import numpy as np
 
 from src.optimizer.settings import GENERATOR_SETTINGS, DEFAULT_OBSERVATION_FEATURES, ObservationFeatureConfig
 from src.simulator.environment import Environment
+from src.simulator.managers.constraint_index import ConstraintIndex
+from src.optimizer.utils.feature_timing import FeatureTimings
+from src.optimizer.utils.observation_encoding import encode_observation
 from src.simulator.units.point import Point
 
 
 class ObservationBuilder:
     _EMPTY_TRAVEL_TIME = GENERATOR_SETTINGS.max_requests_num
 
+    _PAIRWISE_KEYS = (
+        "travel_time_to_load",
+        "travel_time_with_cargo_to_unload",
+        "earliness_to_window_start",
+        "lateness_to_window_start",
+    )
+    # Нормализованные парные признаки несуществующей заявки (по _PAIRWISE_KEYS)
+    _EMPTY_PAIRWISE_VALUES = np.array([1.0, 1.0, 0.0, 1.0], dtype=np.float32)[:, np.newaxis]
 
     def __init__(
             self,
             env: Environment,
-            requests_constrains: list[list[int]],
-            feature_config: ObservationFeatureConfig = DEFAULT_OBSERVATION_FEATURES
+            requests_constrains: ConstraintIndex | list[list[int]],
+            feature_config: ObservationFeatureConfig = DEFAULT_OBSERVATION_FEATURES,
+            return_views: bool = False,
+            timings: FeatureTimings | None = None
     ):
         """ Создатель наблюдений и разрешенной маски
         :param env: Объект Environment с заявками, машинами и прочим
-        :param requests_constrains: Нужно передавать список разрешенных машин с добавленным [-1]
+        :param requests_constrains: Индекс ограничений env (env.constraints) или
+                список разрешенных машин с добавленным [-1]
+        :param return_views: Возвращать сами буферы наблюдения без копирования. Тогда наблюдение
+                действительно только до следующего create_observation (подходит, если наблюдение
+                сразу передается в модель), иначе возвращается копия буферов
+        :param timings: Куда копить время сборки наблюдения по группам признаков (None - без замеров)
         """
         self._env = env
+        self._compiled_env = env.compiled
+        if not isinstance(requests_constrains, ConstraintIndex):
+            requests_constrains = ConstraintIndex.from_allowed_trucks(requests_constrains, len(env.trucks))
         self._req_constrains = requests_constrains
         self._feature_config = feature_config
-        self._static_obs = self._make_normalized_static_observation()
+        self._return_views = return_views
+        self._timings = timings
+        self._buffers, self._pairwise_buffer = self._allocate_buffers()
 
-    @staticmethod
-    def __get_binary_list_with_position_mask(list_len: int, mask: list[int], mask_is_zeros: bool):
-        if mask_is_zeros:
-            binary_list = [1] * list_len
-        else:
-            binary_list = [0] * list_len
-
-        for position in mask:
-            binary_list[position] = 0 if mask_is_zeros else 1
-        return binary_list
-
-    @staticmethod
-    def __make_obs_from_current_selection(selection: list[int]) -> list[int]:
-        # Дополним текущую выборку до максимального кол-ва заявок с помощью -1
-        # Это нужно чтобы можно было его передать как наблюдение в модель
-        remaining_requests_num = GENERATOR_SETTINGS.max_requests_num - len(selection)
-        observation = selection + [-1] * remaining_requests_num
-        return observation
+        if timings is not None:
+            timings.start()
+        self._static_obs = self._make_normalized_static_observation()
+        if timings is not None:
+            timings.lap("time_windows")
+        self._action_masks = self._make_action_masks()
+        if timings is not None:
+            timings.lap("action_masks")
+        self._make_static_pairwise_features()
+        if timings is not None:
+            timings.lap("static_pairwise")
+
+    def _allocate_buffers(self) -> tuple[dict[str, np.ndarray], np.ndarray | None]:
+        # Буферы признаков, которые меняются на каждом шаге (порядок ключей как в наблюдении)
+        max_requests_num = GENERATOR_SETTINGS.max_requests_num
+        buffers = {}
+        pairwise_buffer = None
+        if self._feature_config.use_executed_requests:
+            buffers["executed_requests"] = np.zeros(max_requests_num, dtype=np.int8)
+        if self._feature_config.use_unfinished_ratio:
+            buffers["unfinished_ratio"] = np.zeros(1, dtype=np.float32)
+        if self._feature_config.use_current_selection:
+            buffers["current_selection"] = np.zeros(max_requests_num, dtype=np.int64)
+        if self._feature_config.use_next_request_tw:
+            buffers["next_request_tw"] = np.zeros(2, dtype=np.float32)
+        if self._feature_config.use_pairwise_features:
+            # Парные признаки лежат в одном массиве, чтобы нормализовать их одной операцией
+            pairwise_buffer = np.zeros(
+                (
+                    len(self._PAIRWISE_KEYS),
+                    self._feature_config.pairwise_lookahead_requests,
+                    GENERATOR_SETTINGS.max_truck_num,
+                ),
+                dtype=np.float32
+            )
+            for key, pairwise_values in zip(self._PAIRWISE_KEYS, pairwise_buffer):
+                buffers[key] = pairwise_values
+        return buffers, pairwise_buffer
 
-    @staticmethod
-    def __make_active_list_requests(current_selection: list[int]) -> list[int]:
-        # Дополним бинарную маску до максимального кол-ва заявок с помощью -1
-        # Это нужно чтобы можно было его передать как наблюдение в модель
-        remaining_requests_num = GENERATOR_SETTINGS.max_requests_num - len(current_selection)
-        active_list = [1] * len(current_selection) + [0] * remaining_requests_num
-        return active_list
-
-    @staticmethod
-    def _convert_obs_to_numpy(observation: dict) -> dict:
-        dtype_by_key = {
-            "time_windows": np.float32,
-            "executed_requests": np.int8,
-            "unfinished_ratio": np.float32,
-            "current_selection": np.int64,
-            "next_request_tw": np.float32,
-            "travel_time_to_load": np.float32,
-            "travel_time_with_cargo_to_unload": np.float32,
-            "earliness_to_window_start": np.float32,
-            "lateness_to_window_start": np.float32,
-        }
-        return {
-            key: np.array(value, dtype=dtype_by_key[key])
-            for key, value in observation.items()
-        }
-
-    def _normalize_observation(self, observation: dict) -> None:
-        def _normalize_matrix(values: list[list[float]], mapper) -> list[list[float]]:
-            return [
-                [mapper(value) for value in row]
-                for row in values
-            ]
-
-        for key in observation.keys():
-            match key:
-                case "executed_requests":
-                    # Ничего не нужно нормализовать
-                    pass
-                case "unfinished_ratio":
-                    # Ничего не нужно нормализовать
-                    pass
-                case "current_selection":
-                    pass
-                case "is_active":
-                    pass
-                case "next_request_tw":
-                    observation[key] = [observation[key][0] / self._env.end_date, observation[key][1] / self._env.end_date]
-                case "travel_time_to_load":
-                    observation[key] = _normalize_matrix(
-                        observation[key],
-                        lambda travel_time: min(travel_time / self._env.end_date, 1.0)
-                    )
-                case "travel_time_with_cargo_to_unload":
-                    observation[key] = _normalize_matrix(
-                        observation[key],
-                        lambda travel_time: min(travel_time / self._env.end_date, 1.0)
-                    )
-                case "earliness_to_window_start":
-                    observation[key] = _normalize_matrix(
-                        observation[key],
-                        lambda value: min(max(value / self._env.end_date, 0.0), 1.0)
-                    )
-                case "lateness_to_window_start":
-                    observation[key] = _normalize_matrix(
-                        observation[key],
-                        lambda value: min(max(value / self._env.end_date, 0.0), 1.0)
-                    )
-                case _:
-                    raise NotImplementedError
+    def _normalize_time(self, values: np.ndarray) -> np.ndarray:
+        # Время (в т.ч. отрицательный запас) в долях горизонта, обрезанное до [0, 1]
+        return np.minimum(np.maximum(values / self._env.end_date, 0.0), 1.0)
 
     def _make_normalized_static_observation(self) -> dict:
-        max_and_current_requests_len_delta = GENERATOR_SETTINGS.max_requests_num - self._env.requests_num
-
-        time_windows = []
-        for request in self._env.requests:
-            # Нормализуем временные окна в интервале [0, 1]
-            request_window = [request.point_to_load.date_start_window / self._env.end_date, request.point_to_load.date_end_window / self._env.end_date]
-            time_windows.append(request_window)
-        time_windows += [[0, 0]] * max_and_current_requests_len_delta
-
         static_observation = {}
         if self._feature_config.use_time_windows:
+            # Нормализуем временные окна в интервале [0, 1], недостающие заявки дополняем нулями
+            requests = self._env.requests
+            time_windows = np.zeros((GENERATOR_SETTINGS.max_requests_num, 2), dtype=np.float32)
+            time_windows[:self._env.requests_num] = np.stack(
+                [
+                    requests.get_column("point_to_load.date_start_window"),
+                    requests.get_column("point_to_load.date_end_window"),
+                ],
+                axis=1
+            ) / self._env.end_date
             static_observation["time_windows"] = time_windows
 
+        if self._feature_config.compact_encoding:
+            # Статичную часть кодируем один раз на инстанс
+            static_observation = encode_observation(static_observation, self._feature_config)
         return static_observation
 
-    def create_action_mask(self, current_request_id: int) -> np.ndarray[bool]:
+    def _make_action_masks(self) -> np.ndarray:
         # Тк действие модели на каждом шаге - это выбор id машины на текущую заявку
-        # (по сути число из [-1, max_truck_num]), то
-        # мне нужно знать ограничения текущей заявки, чтобы вернуть бинарный вектор shape=(1, max_truck_num+1)
-        current_req_constrains = np.array(self._req_constrains[current_request_id]) + 1
-        current_req_constrains = list(current_req_constrains)
-        binary_action_mask = self.__get_binary_list_with_position_mask(
-            list_len=GENERATOR_SETTINGS.max_truck_num + 1,
-            mask=current_req_constrains,
-            mask_is_zeros=False
+        # (по сути число из [-1, max_truck_num]), то маска заявки - бинарный вектор shape=(1, max_truck_num+1).
+        # Ограничения за эпизод не меняются, поэтому считаем маски всех заявок сразу
+        # Отказ от заявки (действие 0) разрешен всегда, остальное берем из индекса ограничений
+        action_masks = np.zeros((self._env.requests_num, GENERATOR_SETTINGS.max_truck_num + 1), dtype=bool)
+        action_masks[:, 0] = True
+        action_masks[:, 1:self._req_constrains.trucks_num + 1] = self._req_constrains.allowed_matrix
+        return action_masks
+
+    def _make_static_pairwise_features(self) -> None:
+        # Признаки, которые не зависят от состояния, считаем на весь инстанс shape=(кол-во заявок, кол-во машин):
+        # запрещенные пары (для них подставляется весь горизонт) и время в пути с грузом
+        compiled_env = self._compiled_env
+        self._forbidden_trucks = ~self._req_constrains.allowed_matrix
+        travel_times_with_cargo_to_unload = compiled_env.get_requests_travel_times(
+            request_ids=np.arange(compiled_env.requests_num),
+            departure_points=compiled_env.request_load_points[:, np.newaxis],
+            destination_points=compiled_env.request_unload_points,
+            with_cargo=True
+        )
+        travel_times_with_cargo_to_unload = np.where(
+            self._forbidden_trucks, self._env.end_date, travel_times_with_cargo_to_unload
+        ).astype(np.int64)
+        self._normalized_travel_times_with_cargo_to_unload = self._normalize_time(travel_times_with_cargo_to_unload)
+
+    def create_action_mask(self, current_request_id: int) -> np.ndarray[bool]:
+        # Строка общей матрицы без копирования, ее нельзя изменять
+        return self._action_masks[current_request_id]
+
+    def _get_truck_point_ids(self, truck_positions: list[Point] | None) -> np.ndarray:
+        if truck_positions is None:
+            return self._compiled_env.truck_start_points
+        point_ids = self._compiled_env.point_ids
+        return np.array(
+            [point.id if point.id is not None else point_ids[point.name] for point in truck_positions],
+            dtype=np.int64
         )
-        return np.array(binary_action_mask, dtype=bool)
 
-    def _get_current_truck_positions(self, truck_positions: list[Point] | None) -> list[Point]:
-        if truck_positions is not None:
-            return truck_positions
-        return [truck.position.current_point.model_copy(deep=True) for truck in self._env.trucks]
+    def _get_travel_times_to_load(self, request_ids: np.ndarray, truck_point_ids: np.ndarray) -> np.ndarray:
+        # Время в пути до погрузки (для запрещенных машин - весь горизонт), shape=(кол-во заявок, кол-во машин)
+        travel_times_to_load = self._compiled_env.get_requests_travel_times(
+            request_ids=request_ids,
+            departure_points=truck_point_ids[np.newaxis, :],
+            destination_points=self._compiled_env.request_load_points[request_ids],
+            with_cargo=False
+        )
+        return np.where(self._forbidden_trucks[request_ids], self._env.end_date, travel_times_to_load).astype(np.int64)
 
-    def _build_empty_pairwise_row(
+    def _get_time_slacks_to_window_start(
             self,
-            *,
-            travel_time_value: int | None = None,
-            slack_value: int | None = None,
-    ) -> list[int]:
-        if travel_time_value is not None:
-            return [travel_time_value] * GENERATOR_SETTINGS.max_truck_num
-        if slack_value is not None:
-            return [slack_value] * GENERATOR_SETTINGS.max_truck_num
-        raise ValueError("Either travel_time_value or slack_value must be provided")
-
-    def _get_travel_time_to_load_for_request(
+            request_ids: np.ndarray,
+            travel_times_to_load: np.ndarray,
+            truck_available_times: np.ndarray
+    ) -> np.ndarray:
+        # Запас до начала окна (отрицательный - опоздание), для запрещенных машин - минус весь горизонт
+        time_slacks_to_window_start = self._compiled_env.request_window_starts[request_ids, np.newaxis] - (
+            truck_available_times[np.newaxis, :] + travel_times_to_load
+        )
+        return np.where(self._forbidden_trucks[request_ids], -self._env.end_date, time_slacks_to_window_start)
+
+    def _fill_pairwise_features(
             self,
-            request_id: int,
+            pairwise_buffer: np.ndarray,
+            current_request_id: int,
             truck_positions: list[Point] | None,
-    ) -> list[int]:
-        travel_time_to_load = [0] * GENERATOR_SETTINGS.max_truck_num
-        if request_id >= self._env.requests_num:
-            return self._build_empty_pairwise_row(travel_time_value=self._env.end_date)
-
-        current_truck_positions = self._get_current_truck_positions(truck_positions)
-        next_request = self._env.requests[request_id]
-        for truck_id in range(len(self._env.trucks)):
-            if truck_id not in self._req_constrains[request_id]:
-                travel_time_to_load[truck_id] = self._env.end_date
-                continue
-            travel_time_to_load[truck_id] = self._env.route_manager.calculate_travel_time_to_point(
-                truck=self._env.trucks[truck_id],
-                with_cargo=False,
-                request=next_request,
-                departure_point=current_truck_positions[truck_id],
-                destination_point=next_request.point_to_load
-            )
-        return travel_time_to_load
+            truck_available_times: list[int] | None,
+    ) -> None:
+        # Все строки lookahead считаются разом: shape=(кол-во признаков, кол-во заявок lookahead, кол-во машин)
+        trucks_num = self._compiled_env.trucks_num
+        truck_point_ids = self._get_truck_point_ids(truck_positions)
+        truck_available_times = np.array(truck_available_times or [0] * trucks_num, dtype=np.int64)
+
+        # Существующие заявки lookahead идут подряд с начала
+        lookahead_requests_num = self._feature_config.pairwise_lookahead_requests
+        existing_requests_num = max(min(lookahead_requests_num, self._env.requests_num - current_request_id), 0)
+        request_ids = np.arange(current_request_id, current_request_id + existing_requests_num)
+
+        travel_times_to_load = self._get_travel_times_to_load(request_ids, truck_point_ids)
+        time_slacks_to_window_start = self._get_time_slacks_to_window_start(
+            request_ids, travel_times_to_load, truck_available_times
+        )
 
-    def _get_time_slack_to_window_start(
-            self,
-            request_id: int,
-            travel_time_to_load: list[int],
-            truck_available_times: list[int] | None
-    ) -> list[int]:
-        time_slack_to_window_start = [0] * GENERATOR_SETTINGS.max_truck_num
-        if request_id >= self._env.requests_num:
-            return self._build_empty_pairwise_row(slack_value=-self._env.end_date)
-
-        next_request = self._env.requests[request_id]
-        current_truck_available_times = truck_available_times or [0] * len(self._env.trucks)
-        for truck_id in range(len(self._env.trucks)):
-            if truck_id not in self._req_constrains[request_id]:
-                time_slack_to_window_start[truck_id] = -self._env.end_date
-                continue
-            time_slack_to_window_start[truck_id] = (
-                next_request.point_to_load.date_start_window -
-                (current_truck_available_times[truck_id] + travel_time_to_load[truck_id])
+        # Строки в порядке _PAIRWISE_KEYS, машины сверх кол-ва в инстансе заполнены нулями.
+        # Время в пути с грузом не зависит от состояния и берется из посчитанной на инстанс матрицы
+        existing_rows = pairwise_buffer[:, :existing_requests_num]
+        existing_rows[1, :, :trucks_num] = self._normalized_travel_times_with_cargo_to_unload[request_ids]
+        existing_rows[[0, 2, 3], :, :trucks_num] = self._normalize_time(np.stack([
+            travel_times_to_load,
+            time_slacks_to_window_start,
+            -time_slacks_to_window_start,
+        ]))
+        existing_rows[:, :, trucks_num:] = 0.0
+        # Несуществующие заявки: время в пути - весь горизонт, запас - минус весь горизонт
+        pairwise_buffer[:, existing_requests_num:] = self._EMPTY_PAIRWISE_VALUES[:, np.newaxis]
+
+    def _fill_next_request_tw(self, next_request_tw: np.ndarray, next_request_id: int) -> None:
+        # Временное окно следующей заявки
+        if next_request_id < self._env.requests_num:
+            next_request_tw[:] = (
+                self._compiled_env.request_window_starts[next_request_id] / self._env.end_date,
+                self._compiled_env.request_window_ends[next_request_id] / self._env.end_date,
             )
-        return time_slack_to_window_start
-
-    def _get_travel_time_with_cargo_to_unload_for_request(self, request_id: int) -> list[int]:
-        travel_time_with_cargo_to_unload = [0] * GENERATOR_SETTINGS.max_truck_num
-        if request_id >= self._env.requests_num:
-            return self._build_empty_pairwise_row(travel_time_value=self._env.end_date)
-
-        next_request = self._env.requests[request_id]
-        for truck_id in range(len(self._env.trucks)):
-            if truck_id not in self._req_constrains[request_id]:
-                travel_time_with_cargo_to_unload[truck_id] = self._env.end_date
-                continue
-            travel_time_with_cargo_to_unload[truck_id] = self._env.route_manager.calculate_travel_time_to_point(
-                truck=self._env.trucks[truck_id],
-                with_cargo=True,
-                request=next_request,
-                departure_point=next_request.point_to_load,
-                destination_point=next_request.point_to_unload
-            )
-        return travel_time_with_cargo_to_unload
-
-    @staticmethod
-    def _split_slack_to_earliness_and_lateness(time_slack_to_window_start: list[int]) -> tuple[list[int], list[int]]:
-        earliness_to_window_start = [max(slack, 0) for slack in time_slack_to_window_start]
-        lateness_to_window_start = [max(-slack, 0) for slack in time_slack_to_window_start]
-        return earliness_to_window_start, lateness_to_window_start
+        else:
+            next_request_tw.fill(0.0)
 
-    def _get_pairwise_feature_matrices(
+    def _fill_observation(
             self,
+            buffers: dict[str, np.ndarray],
+            pairwise_buffer: np.ndarray | None,
+            missed_requests_ids: list[int],
             current_selection: list[int],
             truck_positions: list[Point] | None,
-            truck_available_times: list[int] | None,
-    ) -> tuple[list[list[int]], list[list[int]], list[list[int]], list[list[int]]]:
-        travel_time_to_load = []
-        travel_time_with_cargo_to_unload = []
-        earliness_to_window_start = []
-        lateness_to_window_start = []
-
-        current_request_id = len(current_selection)
-        for lookahead_offset in range(self._feature_config.pairwise_lookahead_requests):
-            request_id = current_request_id + lookahead_offset
-            current_travel_time_to_load = self._get_travel_time_to_load_for_request(
-                request_id=request_id,
-                truck_positions=truck_positions,
-            )
-            current_travel_time_with_cargo_to_unload = self._get_travel_time_with_cargo_to_unload_for_request(
-                request_id=request_id
-            )
-            current_time_slack_to_window_start = self._get_time_slack_to_window_start(
-                request_id=request_id,
-                travel_time_to_load=current_travel_time_to_load,
-                truck_available_times=truck_available_times,
-            )
-            current_earliness_to_window_start, current_lateness_to_window_start = (
-                self._split_slack_to_earliness_and_lateness(current_time_slack_to_window_start)
-            )
-
-            travel_time_to_load.append(current_travel_time_to_load)
-            travel_time_with_cargo_to_unload.append(current_travel_time_with_cargo_to_unload)
-            earliness_to_window_start.append(current_earliness_to_window_start)
-            lateness_to_window_start.append(current_lateness_to_window_start)
+            truck_available_times: list[int] | None
+    ) -> None:
+        # Полная пересборка наблюдения в переданных буферах
+        selection_len = len(current_selection)
+        timings = self._timings
+        if timings is not None:
+            timings.start()
+
+        if "executed_requests" in buffers:
+            # Бинарная маска выполненных заявок (пропущенные и еще не начатые - нули)
+            executed_requests = buffers["executed_requests"]
+            executed_requests.fill(0)
+            executed_requests[:selection_len] = 1
+            executed_requests[missed_requests_ids] = 0
+            if timings is not None:
+                timings.lap("executed_requests")
+        if "unfinished_ratio" in buffers:
+            # Отношение невыполненных заявок к уже расставленным
+            buffers["unfinished_ratio"][0] = len(missed_requests_ids) / selection_len if selection_len > 0 else 0
+            if timings is not None:
+                timings.lap("unfinished_ratio")
+        if "current_selection" in buffers:
+            # Дополняем выборку незначащими -1 до кол-ва требуемого в наблюдении
+            selection_obs = buffers["current_selection"]
+            selection_obs.fill(-1)
+            selection_obs[:selection_len] = current_selection
+            if timings is not None:
+                timings.lap("current_selection")
+        if "next_request_tw" in buffers:
+            self._fill_next_request_tw(buffers["next_request_tw"], selection_len)
+            if timings is not None:
+                timings.lap("next_request_tw")
+        if pairwise_buffer is not None:
+            self._fill_pairwise_features(pairwise_buffer, selection_len, truck_positions, truck_available_times)
+            if timings is not None:
+                timings.lap("pairwise")
+
+    def _output_observation(self, buffers: dict[str, np.ndarray]) -> dict:
+        # Замер продолжает отметки _fill_observation / ObservationSession.append
+        if self._feature_config.compact_encoding:
+            # Кодирование и так создает новые (меньшие) массивы
+            observation = encode_observation(buffers, self._feature_config)
+        elif self._return_views:
+            observation = dict(buffers)
+        else:
+            observation = {key: value.copy() for key, value in buffers.items()}
 
-        return (
-            travel_time_to_load,
-            travel_time_with_cargo_to_unload,
-            earliness_to_window_start,
-            lateness_to_window_start,
-        )
+        if self._return_views:
+            observation.update(self._static_obs)
+        else:
+            observation.update({key: value.copy() for key, value in self._static_obs.items()})
+        if self._timings is not None:
+            self._timings.lap("output")
+        return observation
 
     def create_observation(
             self,
@@ -279,51 +285,93 @@ class ObservationBuilder:
             truck_positions: list[Point] | None = None,
             truck_available_times: list[int] | None = None
     ) -> dict:
-        # Получаем бинарную маску с выполненными и невыполненными заявками
-        not_started_requests_ids = [i for i in range(len(current_selection), GENERATOR_SETTINGS.max_requests_num)]
-        executed_requests = self.__get_binary_list_with_position_mask(
-            list_len=GENERATOR_SETTINGS.max_requests_num,
-            mask=missed_requests_ids + not_started_requests_ids,
-            mask_is_zeros=True
-        )
-        # Считаем отношение невыполненных заявок к выполненным
-        if len(current_selection) > 0:
-            unfinished_ratio = [ len(missed_requests_ids) / len(current_selection) ]
-        else:
-            unfinished_ratio = [0]
-        # Дополняем выборку незначащими -1 до кол-ва требуемого в наблюдении
-        selection_obs = self.__make_obs_from_current_selection(current_selection)
-        # Вычисляем временное окно следующей заявки
-        if len(current_selection) < self._env.requests_num:
-            next_request = self._env.requests[len(current_selection)]
-            next_request_tw = [next_request.point_to_load.date_start_window, next_request.point_to_load.date_end_window]
-        else:
-            next_request_tw = [0, 0]
-        (
-            travel_time_to_load,
-            travel_time_with_cargo_to_unload,
-            earliness_to_window_start,
-            lateness_to_window_start,
-        ) = self._get_pairwise_feature_matrices(
-            current_selection=current_selection,
-            truck_positions=truck_positions,
-            truck_available_times=truck_available_times,
+        self._fill_observation(
+            self._buffers,
+            self._pairwise_buffer,
+            missed_requests_ids,
+            current_selection,
+            truck_positions,
+            truck_available_times
         )
-        observation = {}
-        if self._feature_config.use_executed_requests:
-            observation["executed_requests"] = executed_requests
-        if self._feature_config.use_unfinished_ratio:
-            observation["unfinished_ratio"] = unfinished_ratio
-        if self._feature_config.use_current_selection:
-            observation["current_selection"] = selection_obs
-        if self._feature_config.use_next_request_tw:
-            observation["next_request_tw"] = next_request_tw
-        if self._feature_config.use_pairwise_features:
-            observation["travel_time_to_load"] = travel_time_to_load
-            observation["travel_time_with_cargo_to_unload"] = travel_time_with_cargo_to_unload
-            observation["earliness_to_window_start"] = earliness_to_window_start
-            observation["lateness_to_window_start"] = lateness_to_window_start
-        self._normalize_observation(observation)
-        observation.update(self._static_obs)
-
-        return self._convert_obs_to_numpy(observation)
+        return self._output_observation(self._buffers)
+
+    def start_session(self) -> "ObservationSession":
+        return ObservationSession(self)
+
+
+class ObservationSession:
+    """ Инкрементальное наблюдение для выборки, которая растет только добавлением в конец (как SimulatorSession)
+
+        Между шагами в current_selection и executed_requests меняются только позиции новой
+        и новых пропущенных заявок, поэтому стоимость шага не зависит от
+        GENERATOR_SETTINGS.max_requests_num. Результат совпадает с create_observation на всей выборке.
+        Буферы у сессии свои, create_observation того же ObservationBuilder их не затрагивает.
+    """
+
+    def __init__(self, builder: ObservationBuilder):
+        self._builder = builder
+        self._buffers, self._pairwise_buffer = builder._allocate_buffers()
+        self._selection_len = 0
+        self._missed_requests_num = 0
+        self.reset()
+
+    @property
+    def selection_len(self) -> int:
+        return self._selection_len
+
+    def reset(self) -> dict:
+        """ Наблюдение для пустой выборки """
+        self._selection_len = 0
+        self._missed_requests_num = 0
+        self._builder._fill_observation(self._buffers, self._pairwise_buffer, [], [], None, None)
+        return self._builder._output_observation(self._buffers)
+
+    def append(
+            self,
+            truck_id: int,
+            missed_requests_ids: list[int],
+            truck_positions: list[Point] | None = None,
+            truck_available_times: list[int] | None = None
+    ) -> dict:
+        """ Применяет к наблюдению добавленную в конец выборки машину
+
+        :param truck_id: Машина на следующую заявку (-1 - отказ)
+        :param missed_requests_ids: Все пропущенные заявки выборки (в порядке добавления, как в SimulatorSession)
+        :param truck_positions: Точки машин после добавления
+        :param truck_available_times: Время освобождения машин после добавления
+        """
+        request_id = self._selection_len
+        assert request_id < GENERATOR_SETTINGS.max_requests_num, "Все заявки уже распределены"
+        assert len(missed_requests_ids) >= self._missed_requests_num, "Пропущенные заявки не могут исчезнуть"
+        self._selection_len += 1
+        new_missed_requests_ids = missed_requests_ids[self._missed_requests_num:]
+        self._missed_requests_num = len(missed_requests_ids)
+
+        buffers = self._buffers
+        timings = self._builder._timings
+        if timings is not None:
+            timings.start()
+        if "executed_requests" in buffers:
+            buffers["executed_requests"][request_id] = 1
+            buffers["executed_requests"][new_missed_requests_ids] = 0
+            if timings is not None:
+                timings.lap("executed_requests")
+        if "unfinished_ratio" in buffers:
+            buffers["unfinished_ratio"][0] = self._missed_requests_num / self._selection_len
+            if timings is not None:
+                timings.lap("unfinished_ratio")
+        if "current_selection" in buffers:
+            buffers["current_selection"][request_id] = truck_id
+            if timings is not None:
+                timings.lap("current_selection")
+        if "next_request_tw" in buffers:
+            self._builder._fill_next_request_tw(buffers["next_request_tw"], self._selection_len)
+            if timings is not None:
+                timings.lap("next_request_tw")
+        if self._pairwise_buffer is not None:
+            self._builder._fill_pairwise_features(
+                self._pairwise_buffer, self._selection_len, truck_positions, truck_available_times
+            )
+            if timings is not None:
+                timings.lap("pairwise")
+        return self._builder._output_observation(buffers)
@@ -0,0 +1,75 @@
+import numpy as np
+from gymnasium import spaces
+
+from src.optimizer.settings import GENERATOR_SETTINGS, ObservationFeatureConfig
+
+# Признаки в долях горизонта [0, 1], которые в компактной кодировке квантуются в целые
+QUANTIZED_KEYS = (
+    "time_windows",
+    "unfinished_ratio",
+    "next_request_tw",
+    "travel_time_to_load",
+    "travel_time_with_cargo_to_unload",
+    "earliness_to_window_start",
+    "lateness_to_window_start",
+)
+
+
+def get_compact_selection_dtype(max_truck_num: int = GENERATOR_SETTINGS.max_truck_num) -> np.dtype:
+    """ Наименьший знаковый тип, в который помещаются id машин в выборке [-1, max_truck_num - 1] """
+    for dtype in (np.int8, np.int16, np.int32):
+        if max_truck_num - 1 <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def get_quantized_time_dtype(feature_config: ObservationFeatureConfig) -> np.dtype:
+    return np.dtype(feature_config.quantized_time_dtype)
+
+
+def get_quantization_scale(feature_config: ObservationFeatureConfig) -> int:
+    """ Целое, которому соответствует 1.0 (весь горизонт) """
+    return int(np.iinfo(get_quantized_time_dtype(feature_config)).max)
+
+
+def quantize(values: np.ndarray, feature_config: ObservationFeatureConfig) -> np.ndarray:
+    """ Значения из [0, 1] в целые [0, scale] с округлением к ближайшему """
+    scale = get_quantization_scale(feature_config)
+    return np.rint(values * scale).astype(get_quantized_time_dtype(feature_config))
+
+
+def dequantize(values: np.ndarray, feature_config: ObservationFeatureConfig) -> np.ndarray:
+    return values.astype(np.float32) / get_quantization_scale(feature_config)
+
+
+def encode_observation(observation: dict[str, np.ndarray], feature_config: ObservationFeatureConfig) -> dict:
+    """ Компактная копия наблюдения (executed_requests уже int8 и не меняется) """
+    encoded_observation = {}
+    for key, value in observation.items():
+        if key in QUANTIZED_KEYS:
+            encoded_observation[key] = quantize(value, feature_config)
+        elif key == "current_selection":
+            encoded_observation[key] = value.astype(get_compact_selection_dtype())
+        else:
+            encoded_observation[key] = value.copy()
+    return encoded_observation
+
+
+def encode_observation_space(observation_space: dict[str, spaces.Space], feature_config: ObservationFeatureConfig) -> dict:
+    """ Пространства наблюдения с типами компактной кодировки (границы квантованных признаков - [0, scale]) """
+    encoded_space = {}
+    for key, space in observation_space.items():
+        if key in QUANTIZED_KEYS:
+            encoded_space[key] = spaces.Box(
+                0, get_quantization_scale(feature_config), shape=space.shape,
+                dtype=get_quantized_time_dtype(feature_config)
+            )
+        elif key == "current_selection":
+            selection_dtype = get_compact_selection_dtype()
+            encoded_space[key] = spaces.Box(
+                low=space.low.astype(selection_dtype), high=space.high.astype(selection_dtype),
+                shape=space.shape, dtype=selection_dtype
+            )
+        else:
+            encoded_space[key] = space
+    return encoded_space
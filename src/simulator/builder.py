@@ -1,7 +1,9 @@
 import json
+from pathlib import Path
 
 from src.simulator.environment import Environment
-from src.simulator.units.requirement import apply_requirements
+from src.simulator.managers.point_table import PointTable
+from src.simulator.managers.route_network import RouteNetwork
 from src.simulator.utils.time import Time
 
 
@@ -11,14 +13,45 @@ def __open_file(file_path: str):
     return file_data
 
 
-def get_env(input_data: dict, routes_data: dict) -> Environment:
+def get_env(
+        input_data: dict,
+        routes_data: list[dict] | RouteNetwork | str | Path,
+        routes_sha256: str | None = None,
+        trusted: bool = False
+) -> Environment:
+    """
+    :param input_data: Входные данные (время, машины, заявки)
+    :param routes_data: Маршруты, уже разобранная сеть маршрутов или путь к файлу маршрутов
+    :param routes_sha256: Хеш файла маршрутов
+    :param trusted: Данные заведомо корректны (выход InputDataGenerator) - собираем без pydantic-валидации
+    """
+    if isinstance(routes_data, (str, Path)):
+        # Маршруты из файла - сеть берется из бинарного кэша рядом с ним (общего для всех процессов)
+        routes_data = RouteNetwork.load_or_build(routes_data, routes_sha256)
+
     # Переводим все даты в периоды
     time = Time(input_data['time']['simulator_start_date'], input_data['time']['simulator_end_date'])
     input_data = time.transition_to_periods(input_data)
     # routes_data = time.transition_to_periods(routes_data)
 
+    # Интернируем имена точек в плотные id (имена остаются только на входе и выходе)
+    point_table = PointTable.from_input_data(input_data, routes_data)
+    point_table.intern(input_data, routes_data)
+
+    if trusted:
+        return Environment.from_trusted_data(
+            end_date=time.end_period,
+            point_table=point_table,
+            routes_data=routes_data,
+            trucks_data=input_data['trucks'],
+            requests_data=input_data['requests'],
+            routes_sha256=routes_sha256,
+        )
+
     env_data = {
         'end_date': time.end_period,
+        'point_table': point_table,
+        'routes_sha256': routes_sha256,
         'route_manager': routes_data,
         'trucks': input_data['trucks'],
         'requests': input_data['requests']
@@ -28,5 +61,5 @@ def get_env(input_data: dict, routes_data: dict) -> Environment:
 
 
 def get_requests_constraints(env: Environment, with_missed: bool) -> list[list[int]]:
-    requests_constrains = apply_requirements(env.requests, env.trucks, with_missed=with_missed)
-    return requests_constrains
+    # Списки берутся из общего для env индекса ограничений, их нельзя изменять
+    return env.constraints.get_allowed_trucks(with_missed=with_missed)
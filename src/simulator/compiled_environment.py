@@ -0,0 +1,161 @@
+import numpy as np
+
+from src.simulator.managers.route_manager import RouteManager
+from src.simulator.units.entities import Entities
+
+
+# Время в пути, если пути между точками нет и после дополнения сети кратчайшими путями
+# (заведомо больше любого горизонта симуляции)
+UNREACHABLE_TRAVEL_TIME = np.iinfo(np.int32).max
+
+
+class CompiledEnvironment:
+    """ Представление Environment в виде массивов, которое строится один раз на инстанс
+
+        Точки заменены плотными целочисленными id, маршруты - матрицей расстояний,
+        а параметры машин и заявок - массивами по id машины и id заявки.
+        Время в пути предрассчитано в таблицу [машина, откуда, куда, с грузом] только между точками
+        инстанса (стартовые точки машин и точки заявок), а для заявок с фиксированным маршрутом -
+        в отдельную таблицу [заявка, машина, с грузом].
+
+        :arg instance_point_ids: id точек инстанса (по возрастанию) - строки и столбцы travel_times
+    """
+
+    def __init__(self, end_date: int, route_manager: RouteManager, trucks: Entities, requests: Entities):
+        self.end_date = end_date
+        self.trucks_num = len(trucks)
+        self.requests_num = len(requests)
+
+        # id точек берутся из PointTable, по которой построены маршруты
+        point_table = route_manager.point_table
+        self.point_names = point_table.names
+        self.point_ids = point_table.ids
+        self.distances = route_manager.distances
+
+        # Все массивы берутся столбцами Entities (id точек проставлены в get_env через PointTable.intern)
+        self.truck_start_points = trucks.get_column("position.current_point.id", np.int64)
+        self.truck_capacities = trucks.get_column("cargo_params.capacity", np.int64)
+        self.truck_loading_speeds = trucks.get_column("cargo_params.loading_speed", np.float64)
+        self.truck_unloading_speeds = trucks.get_column("cargo_params.unloading_speed", np.float64)
+        self.truck_speeds_without_cargo = trucks.get_column("moving_params.speed_without_cargo", np.float64)
+        self.truck_speeds_with_cargo = trucks.get_column("moving_params.speed_with_cargo", np.float64)
+
+        self.request_load_points = requests.get_column("point_to_load.id", np.int64)
+        self.request_unload_points = requests.get_column("point_to_unload.id", np.int64)
+        self.request_window_starts = requests.get_column("point_to_load.date_start_window", np.int64)
+        self.request_window_ends = requests.get_column("point_to_load.date_end_window", np.int64)
+        self.request_volumes = requests.get_column("volume", np.float64)
+        # Для заявок с фиксированным маршрутом любая поездка идет по нему (см. RouteManager.find_route)
+        self.request_fix_route_distances = np.array(
+            [
+                route_manager.get_route_distance(fix_route) if fix_route is not None else np.nan
+                for fix_route in requests.get_column("fix_route")
+            ],
+            dtype=np.float64
+        )
+
+        # Сеть маршрутов может быть намного больше инстанса, поэтому таблица времени в пути строится
+        # только по его точкам, а id точек переводятся в индексы таблицы через __instance_point_index
+        self.instance_point_ids = np.unique(
+            np.concatenate([self.truck_start_points, self.request_load_points, self.request_unload_points])
+        )
+        # Точка без маршрутов - ошибка во входных данных, а не недостижимая пара
+        route_manager.check_points_routed(self.instance_point_ids)
+        self.__instance_point_index = np.full(len(point_table), -1, dtype=np.int64)
+        self.__instance_point_index[self.instance_point_ids] = np.arange(len(self.instance_point_ids))
+        self.travel_times = self.__build_travel_times()
+        self.request_has_fix_route = ~np.isnan(self.request_fix_route_distances)
+        self.fix_route_travel_times = self.__build_fix_route_travel_times()
+        self.loading_times = self.__build_cargo_times(self.truck_loading_speeds)
+        self.unloading_times = self.__build_cargo_times(self.truck_unloading_speeds)
+
+    def __get_truck_speeds(self) -> np.ndarray:
+        # shape=(кол-во машин, 2), где индекс 1 - скорость с грузом
+        return np.stack([self.truck_speeds_without_cargo, self.truck_speeds_with_cargo], axis=1)
+
+    @staticmethod
+    def __distances_to_travel_times(distances: np.ndarray, speeds: np.ndarray) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            travel_times = np.ceil(distances / speeds)
+        travel_times[~np.isfinite(travel_times)] = UNREACHABLE_TRAVEL_TIME
+        return travel_times.astype(np.int32)
+
+    def __build_travel_times(self) -> np.ndarray:
+        # Из матрицы расстояний (в т.ч. memory-map общей сети) читаются только строки точек инстанса
+        instance_distances = np.asarray(self.distances)[np.ix_(self.instance_point_ids, self.instance_point_ids)]
+        return self.__distances_to_travel_times(
+            instance_distances[np.newaxis, :, :, np.newaxis],
+            self.__get_truck_speeds()[:, np.newaxis, np.newaxis, :]
+        )
+
+    def __build_fix_route_travel_times(self) -> np.ndarray:
+        # Для заявок без фиксированного маршрута значения не используются
+        fix_route_distances = np.nan_to_num(self.request_fix_route_distances, nan=0.0)
+        return self.__distances_to_travel_times(
+            fix_route_distances[:, np.newaxis, np.newaxis],
+            self.__get_truck_speeds()[np.newaxis, :, :]
+        )
+
+    def __build_cargo_times(self, process_speeds: np.ndarray) -> np.ndarray:
+        # shape=(кол-во заявок, кол-во машин)
+        return np.ceil(self.request_volumes[:, np.newaxis] / process_speeds[np.newaxis, :]).astype(np.int64)
+
+    def get_travel_times(
+            self,
+            truck_ids: np.ndarray | int,
+            request_id: int,
+            departure_points: np.ndarray | int,
+            destination_point: int,
+            with_cargo: bool
+    ) -> np.ndarray | np.int32:
+        if self.request_has_fix_route[request_id]:
+            return np.where(
+                departure_points == destination_point,
+                0,
+                self.fix_route_travel_times[request_id, truck_ids, int(with_cargo)]
+            )
+        return self.travel_times[
+            truck_ids,
+            self.__instance_point_index[departure_points],
+            self.__instance_point_index[destination_point],
+            int(with_cargo)
+        ]
+
+    def get_requests_travel_times(
+            self,
+            request_ids: np.ndarray,
+            departure_points: np.ndarray,
+            destination_points: np.ndarray,
+            with_cargo: bool
+    ) -> np.ndarray:
+        """ Время в пути всех машин сразу для нескольких заявок (как get_travel_times по каждой заявке)
+
+        :param request_ids: id заявок, shape=(кол-во заявок,)
+        :param departure_points: Точки отправления, shape=(кол-во заявок, кол-во машин) или приводимая к ней
+        :param destination_points: Точки назначения, shape=(кол-во заявок,)
+        :return: shape=(кол-во заявок, кол-во машин)
+        """
+        truck_ids = np.arange(self.trucks_num)[np.newaxis, :]
+        request_ids = np.asarray(request_ids)[:, np.newaxis]
+        destination_points = np.asarray(destination_points)[:, np.newaxis]
+        travel_times = self.travel_times[
+            truck_ids,
+            self.__instance_point_index[departure_points],
+            self.__instance_point_index[destination_points],
+            int(with_cargo)
+        ]
+        fix_route_travel_times = np.where(
+            departure_points == destination_points,
+            0,
+            self.fix_route_travel_times[request_ids, truck_ids, int(with_cargo)]
+        )
+        return np.where(self.request_has_fix_route[request_ids], fix_route_travel_times, travel_times)
+
+    def get_cargo_times(
+            self,
+            truck_ids: np.ndarray | int,
+            request_id: int,
+            is_loading_process: bool
+    ) -> np.ndarray | np.int64:
+        cargo_times = self.loading_times if is_loading_process else self.unloading_times
+        return cargo_times[request_id, truck_ids]
@@ -1,7 +1,12 @@
-from pydantic import BaseModel, ConfigDict, field_validator, ValidationError
+from pydantic import BaseModel, ConfigDict, PrivateAttr, ValidationInfo, field_validator, ValidationError
 
+from src.simulator.compiled_environment import CompiledEnvironment
+from src.simulator.managers.constraint_index import ConstraintIndex
+from src.simulator.managers.point_table import PointTable
 from src.simulator.managers.route_manager import RouteManager
+from src.simulator.managers.route_network import RouteNetwork
 from src.simulator.units.entities import Entities
+from src.simulator.units.requirement import build_allowed_matrix
 from src.simulator.units.request import Request
 from src.simulator.units.route import Route
 from src.simulator.units.truck import Truck
@@ -11,14 +16,74 @@ class Environment(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed = True)
 
     end_date: int
+    # Объявлены до route_manager, чтобы быть доступными в его валидаторе
+    point_table: PointTable | None = None
+    # Хеш файла маршрутов (ключ кэша кратчайших путей для разреженных сетей)
+    routes_sha256: str | None = None
     route_manager: RouteManager
     trucks: Entities
     requests: Entities
 
+    _compiled: CompiledEnvironment | None = PrivateAttr(default=None)
+    _constraints: ConstraintIndex | None = PrivateAttr(default=None)
+
+    @classmethod
+    def from_trusted_data(
+            cls,
+            end_date: int,
+            point_table: PointTable,
+            routes_data: list[dict] | RouteNetwork,
+            trucks_data: list[dict],
+            requests_data: list[dict],
+            routes_sha256: str | None = None
+    ) -> "Environment":
+        """ Быстрая сборка для заведомо корректных данных (выход InputDataGenerator)
+
+        Валидаторы полей Environment пропускаются, а модели машин и заявок строятся только при
+        обращении к ним (CompiledEnvironment и ограничения читают столбцы прямо из данных).
+        Внешние входные данные нужно собирать обычным конструктором.
+        """
+        if isinstance(routes_data, RouteNetwork):
+            route_manager = RouteManager(routes_data, point_table)
+        else:
+            routes = [Route(**route_elem_data) for route_elem_data in routes_data]
+            route_manager = RouteManager(routes, point_table, routes_sha256)
+        return cls.model_construct(
+            end_date=end_date,
+            point_table=point_table,
+            routes_sha256=routes_sha256,
+            route_manager=route_manager,
+            trucks=Entities(trucks_data, Truck, trusted=True),
+            requests=Entities(cls._sort_requests_data(requests_data), Request, trusted=True),
+        )
+
+    @staticmethod
+    def _sort_requests_data(data: list[dict]) -> list[dict]:
+        return sorted(
+            data,
+            key=lambda request_data: request_data["point_to_load"]["date_start_window"],
+        )
+
+    def model_post_init(self, context) -> None:
+        # Таблицы времени в пути и прочие массивы строим сразу при создании инстанса
+        self._compiled = CompiledEnvironment(self.end_date, self.route_manager, self.trucks, self.requests)
+
     @property
     def requests_num(self):
         return len(self.requests)
 
+    @property
+    def compiled(self) -> CompiledEnvironment:
+        # Строится в model_post_init при создании инстанса
+        return self._compiled
+
+    @property
+    def constraints(self) -> ConstraintIndex:
+        # Ограничения заявок считаем один раз на инстанс и переиспользуем везде
+        if self._constraints is None:
+            self._constraints = ConstraintIndex(build_allowed_matrix(self.requests, self.trucks))
+        return self._constraints
+
     @field_validator("trucks", mode="before")
     @classmethod
     def __init_trucks(cls, data: list[dict]) -> Entities:
@@ -32,24 +97,23 @@ class Environment(BaseModel):
     @classmethod
     def __init_requests(cls, data: list[dict]) -> Entities:
         try:
-            sorted_data = sorted(
-                data,
-                key=lambda request_data: request_data["point_to_load"]["date_start_window"],
-            )
-            return Entities(sorted_data, Request)
+            return Entities(cls._sort_requests_data(data), Request)
         except ValidationError as e:
             print(e.json())
             raise
 
     @field_validator("route_manager", mode="before")
     @classmethod
-    def __init_route_manager(cls, routes_data: list[dict]) -> RouteManager:
+    def __init_route_manager(cls, routes_data: list[dict] | RouteNetwork, info: ValidationInfo) -> RouteManager:
+        if isinstance(routes_data, RouteNetwork):
+            # Сеть уже разобрана (например, загружена из бинарного кэша) - маршруты не валидируем
+            return RouteManager(routes_data, info.data.get("point_table"))
         try:
             routes = []
             for route_elem_data in routes_data:
                 route = Route(**route_elem_data)
                 routes.append(route)
-            return RouteManager(routes)
+            return RouteManager(routes, info.data.get("point_table"), info.data.get("routes_sha256"))
         except ValidationError as e:
             print(e.json())
             raise
@@ -0,0 +1,41 @@
+import numpy as np
+
+
+class ConstraintIndex:
+    """ Ограничения на распределение заявок, посчитанные один раз на Environment
+
+        :arg allowed_matrix: Булева матрица shape=(кол-во заявок, кол-во машин),
+                True - машину можно поставить на заявку
+    """
+
+    def __init__(self, allowed_matrix: np.ndarray):
+        self.allowed_matrix = np.asarray(allowed_matrix, dtype=bool)
+        self._allowed_trucks = [np.flatnonzero(row).tolist() for row in self.allowed_matrix]
+        self._allowed_trucks_with_missed = [allowed_trucks + [-1] for allowed_trucks in self._allowed_trucks]
+
+    @classmethod
+    def from_allowed_trucks(cls, requests_constrains: list[list[int]], trucks_num: int) -> "ConstraintIndex":
+        allowed_matrix = np.zeros((len(requests_constrains), trucks_num), dtype=bool)
+        for request_id, allowed_trucks in enumerate(requests_constrains):
+            allowed_truck_ids = [truck_id for truck_id in allowed_trucks if truck_id != -1]
+            allowed_matrix[request_id, allowed_truck_ids] = True
+        return cls(allowed_matrix)
+
+    @property
+    def requests_num(self) -> int:
+        return self.allowed_matrix.shape[0]
+
+    @property
+    def trucks_num(self) -> int:
+        return self.allowed_matrix.shape[1]
+
+    def get_allowed_trucks(self, with_missed: bool) -> list[list[int]]:
+        # Списки общие для всех потребителей, их нельзя изменять
+        if with_missed:
+            return self._allowed_trucks_with_missed
+        return self._allowed_trucks
+
+    def is_allowed(self, request_id: int, truck_id: int) -> bool:
+        if truck_id == -1:
+            return True
+        return 0 <= truck_id < self.trucks_num and bool(self.allowed_matrix[request_id, truck_id])
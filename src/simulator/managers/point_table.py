@@ -0,0 +1,64 @@
+from typing import Iterable
+
+from src.simulator.managers.route_network import RouteNetwork
+
+
+class PointTable:
+    """ Таблица интернирования точек: имя точки <-> плотный целочисленный id
+
+        Строится один раз в get_env, дальше точки внутри симуляции сравниваются
+        и ищутся по id, а имена нужны только на входе и выходе.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        # Сортируем, чтобы id не зависели от порядка данных
+        self._names = sorted(set(names))
+        self._ids = {name: point_id for point_id, name in enumerate(self._names)}
+
+    @classmethod
+    def from_input_data(cls, input_data: dict, routes_data: list[dict] | RouteNetwork) -> "PointTable":
+        names = set()
+        for point_data in cls.iter_point_data(input_data, routes_data):
+            names.add(point_data["name"])
+        if isinstance(routes_data, RouteNetwork):
+            names.update(routes_data.point_names)
+        return cls(names)
+
+    @staticmethod
+    def iter_point_data(input_data: dict, routes_data: list[dict] | RouteNetwork) -> Iterable[dict]:
+        """ Словари всех точек во входных данных (машины, заявки, маршруты) """
+        for truck_data in input_data["trucks"]:
+            yield truck_data["position"]["current_point"]
+        for request_data in input_data["requests"]:
+            yield request_data["point_to_load"]
+            yield request_data["point_to_unload"]
+        # Разобранная сеть маршрутов не содержит словарей точек
+        if isinstance(routes_data, RouteNetwork):
+            return
+        for route_data in routes_data:
+            yield from route_data["properties"]["points"]
+
+    def intern(self, input_data: dict, routes_data: list[dict] | RouteNetwork) -> None:
+        """ Проставляет id точек прямо во входных данных """
+        for point_data in self.iter_point_data(input_data, routes_data):
+            point_data["id"] = self._ids[point_data["name"]]
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    @property
+    def names(self) -> list[str]:
+        return self._names
+
+    @property
+    def ids(self) -> dict[str, int]:
+        return self._ids
+
+    def get_id(self, name: str) -> int:
+        return self._ids[name]
+
+    def get_name(self, point_id: int) -> str:
+        return self._names[point_id]
@@ -1,5 +1,10 @@
-from math import ceil
+from math import ceil, isfinite
 
+import numpy as np
+
+from src.simulator.managers.point_table import PointTable
+from src.simulator.managers.route_network import RouteNetwork
+from src.simulator.managers.shortest_paths import ShortestPathCache
 from src.simulator.units.point import Point
 from src.simulator.units.request import Request
 from src.simulator.units.route import Route
@@ -7,28 +12,84 @@ from src.simulator.units.truck import Truck
 
 
 class RouteManager:
-    def __init__(self, routes: list[Route]):
-        self._matrix = self.__get_route_matrix(routes)
-        self._routes = self.__get_route_dict(routes)
-
-    def __get_route_matrix(self, routes: list[Route]) -> dict[str, dict[str, Route]]:
-        matrix = {}
-        for route in routes:
-            point_0_name = route.properties.points[0].name
-            point_1_name = route.properties.points[-1].name
-
-            # Сохраняем маршрут в матрицу маршрутов
-            if point_0_name not in matrix:
-                matrix[point_0_name] = {}
-            if point_1_name not in matrix:
-                matrix[point_1_name] = {}
-            matrix[point_0_name][point_1_name] = route
-            matrix[point_1_name][point_0_name] = route
-        return matrix
-
-    def __get_route_dict(self, routes: list[Route]) -> dict[str, Route]:
-        routes_dict = {route.properties.name: route for route in routes}
-        return routes_dict
+    """ Маршруты между точками в плотных массивах по id точек из PointTable
+
+        Если в маршрутах есть не все пары точек (разреженная сеть дорог), то для пар без прямого
+        маршрута расстояние берется по кратчайшему пути в графе маршрутов.
+
+        :arg _route_ids: Индекс прямого маршрута в сети для каждой пары точек (-1 - маршрута нет)
+        :arg _distances: Расстояние для каждой пары точек (np.inf - пути нет, 0 - та же точка)
+        :arg _routed_points: Есть ли у точки хоть один маршрут (точки таблицы вне маршрутов - False)
+    """
+
+    def __init__(
+            self,
+            routes: list[Route] | RouteNetwork,
+            point_table: PointTable = None,
+            routes_sha256: str | None = None,
+            shortest_path_cache: ShortestPathCache | None = None
+    ):
+        """
+        :param routes: Маршруты (ребра графа) или уже разобранная сеть маршрутов (например, из бинарного кэша)
+        :param point_table: Таблица id точек (по умолчанию строится по точкам маршрутов)
+        :param routes_sha256: Хеш файла маршрутов - ключ кэша кратчайших путей
+        :param shortest_path_cache: Кэш дополненных матриц расстояний (по умолчанию общий SHORTEST_PATH_CACHE)
+        """
+        if isinstance(routes, RouteNetwork):
+            network = routes
+        else:
+            network = RouteNetwork.from_routes(routes, routes_sha256, shortest_path_cache)
+        if point_table is None:
+            point_table = PointTable(network.point_names)
+        self._point_table = point_table
+        self._network = network
+        self._route_name_ids = {route_name: route_id for route_id, route_name in enumerate(network.route_names)}
+        self._route_ids, self._distances, self._routed_points = self.__get_route_matrices(network)
+
+    def __get_route_matrices(self, network: RouteNetwork) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        points_num = len(self._point_table)
+        if self._point_table.names == network.point_names:
+            # id совпадают - матрицы сети используются без копирования (в т.ч. memory-map из кэша)
+            return network.route_ids, network.distances, np.ones(points_num, dtype=bool)
+
+        # В таблице есть точки вне маршрутов - переносим матрицы сети в матрицы по id таблицы
+        point_ids = np.array([self._point_table.get_id(name) for name in network.point_names], dtype=np.int64)
+        route_ids = np.full((points_num, points_num), -1, dtype=np.int64)
+        route_ids[np.ix_(point_ids, point_ids)] = network.route_ids
+        distances = np.full((points_num, points_num), np.inf, dtype=np.float64)
+        distances[np.ix_(point_ids, point_ids)] = network.distances
+        np.fill_diagonal(distances, 0.0)
+        routed_points = np.zeros(points_num, dtype=bool)
+        routed_points[point_ids] = True
+        return route_ids, distances, routed_points
+
+    def _get_point_id(self, point: Point) -> int:
+        if point.id is not None:
+            return point.id
+        return self._point_table.get_id(point.name)
+
+    @property
+    def point_table(self) -> PointTable:
+        return self._point_table
+
+    @property
+    def network(self) -> RouteNetwork:
+        return self._network
+
+    def check_points_routed(self, point_ids: np.ndarray) -> None:
+        """ KeyError, если у какой-то из точек нет ни одного маршрута (ошибка во входных данных) """
+        unrouted_point_ids = np.asarray(point_ids)[~self._routed_points[point_ids]]
+        if len(unrouted_point_ids) > 0:
+            unrouted_point_names = [self._point_table.get_name(point_id) for point_id in unrouted_point_ids]
+            raise KeyError(f"Нет маршрутов для точек {', '.join(unrouted_point_names)}")
+
+    @property
+    def distances(self) -> np.ndarray:
+        # Плотная матрица расстояний shape=(кол-во точек, кол-во точек) по id из point_table
+        return self._distances
+
+    def get_route_distance(self, route_name: str) -> float:
+        return float(self._network.route_distances[self._route_name_ids[route_name]])
 
     def find_route(
             self,
@@ -36,14 +97,19 @@ class RouteManager:
             departure_point: Point,
             destination_point: Point
     ) -> Route | None:
-        if departure_point.name == destination_point.name:
+        departure_point_id = self._get_point_id(departure_point)
+        destination_point_id = self._get_point_id(destination_point)
+        if departure_point_id == destination_point_id:
             return None
 
         truck_route = None
         if request.has_fix_route():
-            truck_route = self._routes[request.fix_route]
+            truck_route = self._network.get_route(self._route_name_ids[request.fix_route])
         else:
-            truck_route = self._matrix[destination_point.name][departure_point.name]
+            route_id = self._route_ids[destination_point_id, departure_point_id]
+            if route_id == -1:
+                raise KeyError(f"Нет маршрута между {departure_point.name} и {destination_point.name}")
+            truck_route = self._network.get_route(route_id)
         return truck_route
 
     def calculate_distance_to_point(
@@ -52,10 +118,17 @@ class RouteManager:
             departure_point: Point,
             destination_point: Point
     ) -> float:
-        route = self.find_route(request, departure_point, destination_point)
-        if route is None:
+        departure_point_id = self._get_point_id(departure_point)
+        destination_point_id = self._get_point_id(destination_point)
+        if departure_point_id == destination_point_id:
             return 0
-        return route.properties.distance
+        if request.has_fix_route():
+            return self.get_route_distance(request.fix_route)
+        # Прямой маршрут или кратчайший путь, если прямого нет
+        distance = float(self._distances[destination_point_id, departure_point_id])
+        if not isfinite(distance):
+            raise KeyError(f"Нет пути между {departure_point.name} и {destination_point.name}")
+        return distance
 
     def calculate_travel_time_to_point(
             self,
@@ -67,4 +140,4 @@ class RouteManager:
     ) -> int:
         distance = self.calculate_distance_to_point(request, departure_point, destination_point)
         speed = truck.moving_params.calculate_speed(with_cargo)
-        return ceil(distance / speed)
\ No newline at end of file
+        return ceil(distance / speed)
@@ -0,0 +1,180 @@
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from src.simulator.managers.shortest_paths import SHORTEST_PATH_CACHE, ShortestPathCache
+from src.simulator.units.route import Properties, Route
+from src.simulator.utils.hashing import hash_file
+from src.simulator.utils.routes_loader import LazyGeometry, load_routes
+
+
+# Имя директории с бинарным кэшем рядом с файлом маршрутов
+ROUTES_CACHE_DIR_NAME = ".routes_cache"
+
+
+class RouteNetwork:
+    """ Разобранная сеть маршрутов в массивах по id точек (индекс в отсортированном point_names)
+
+        Может быть сохранена в директорию из .npy файлов и загружена через memory-map,
+        тогда процессы с одним файлом маршрутов делят страницы матриц, а не держат свои копии.
+
+        :arg point_names: Имена точек маршрутов
+        :arg route_names: Имя каждого маршрута (как Properties.name)
+        :arg route_points: id начальной и конечной точки, shape=(кол-во маршрутов, 2)
+        :arg route_distances: Расстояние каждого маршрута
+        :arg route_ids: Индекс прямого маршрута для каждой пары точек (-1 - маршрута нет)
+        :arg distances: Расстояние для каждой пары точек (прямой маршрут или кратчайший путь)
+        :arg geometry_offsets: Смещения geometry в файле маршрутов, shape=(кол-во маршрутов, 2)
+    """
+
+    __array_names = ("route_points", "route_distances", "route_ids", "distances", "geometry_offsets")
+
+    def __init__(
+            self,
+            point_names: list[str],
+            route_names: list[str],
+            route_points: np.ndarray,
+            route_distances: np.ndarray,
+            route_ids: np.ndarray,
+            distances: np.ndarray,
+            geometry_offsets: np.ndarray,
+            routes_file_path: Path | None = None,
+            routes: list[Route] | None = None
+    ):
+        self.point_names = point_names
+        self.route_names = route_names
+        self.route_points = route_points
+        self.route_distances = route_distances
+        self.route_ids = route_ids
+        self.distances = distances
+        self.geometry_offsets = geometry_offsets
+        self._routes_file_path = routes_file_path
+        self._routes = routes
+
+    @classmethod
+    def from_routes(
+            cls,
+            routes: list[Route],
+            routes_sha256: str | None = None,
+            shortest_path_cache: ShortestPathCache | None = None,
+            routes_file_path: Path | None = None
+    ) -> "RouteNetwork":
+        route_endpoints = [(route.properties.points[0].name, route.properties.points[-1].name) for route in routes]
+        point_names = sorted({name for endpoints in route_endpoints for name in endpoints})
+        point_ids = {name: point_id for point_id, name in enumerate(point_names)}
+
+        route_points = np.array(
+            [[point_ids[point_0_name], point_ids[point_1_name]] for point_0_name, point_1_name in route_endpoints],
+            dtype=np.int64
+        ).reshape(len(routes), 2)
+        route_distances = np.array([route.properties.distance for route in routes], dtype=np.float64)
+
+        route_ids = np.full((len(point_names), len(point_names)), -1, dtype=np.int64)
+        for route_id, (point_0_id, point_1_id) in enumerate(route_points):
+            # Сохраняем маршрут в матрицу маршрутов (в обе стороны)
+            route_ids[point_0_id, point_1_id] = route_id
+            route_ids[point_1_id, point_0_id] = route_id
+
+        # Индекс -1 указывает на последний элемент - np.inf
+        distances = np.append(route_distances, np.inf)[route_ids]
+        np.fill_diagonal(distances, 0.0)
+        if np.isinf(distances).any():
+            shortest_path_cache = shortest_path_cache if shortest_path_cache is not None else SHORTEST_PATH_CACHE
+            distances = shortest_path_cache.get_or_compute(point_names, distances, routes_sha256)
+
+        geometry_offsets = np.array(
+            [
+                [route.geometry.start, route.geometry.end] if isinstance(route.geometry, LazyGeometry) else [-1, -1]
+                for route in routes
+            ],
+            dtype=np.int64
+        ).reshape(len(routes), 2)
+
+        return cls(
+            point_names=point_names,
+            route_names=[route.properties.name for route in routes],
+            route_points=route_points,
+            route_distances=route_distances,
+            route_ids=route_ids,
+            distances=distances,
+            geometry_offsets=geometry_offsets,
+            routes_file_path=routes_file_path,
+            routes=list(routes),
+        )
+
+    @staticmethod
+    def get_cache_dir(routes_file_path: Path | str, routes_sha256: str) -> Path:
+        return Path(routes_file_path).parent / ROUTES_CACHE_DIR_NAME / routes_sha256
+
+    @classmethod
+    def load_or_build(cls, routes_file_path: Path | str, routes_sha256: str | None = None) -> "RouteNetwork":
+        """ Загружает сеть из бинарного кэша рядом с файлом маршрутов, при промахе - строит и сохраняет
+
+        :param routes_file_path: Путь к routes.json
+        :param routes_sha256: Хеш файла маршрутов (если уже посчитан)
+        """
+        routes_file_path = Path(routes_file_path)
+        if routes_sha256 is None:
+            routes_sha256 = hash_file(routes_file_path)
+        cache_dir = cls.get_cache_dir(routes_file_path, routes_sha256)
+        if cache_dir.exists():
+            return cls.load(cache_dir, routes_file_path)
+
+        routes = [Route(**route_data) for route_data in load_routes(routes_file_path)]
+        network = cls.from_routes(routes, routes_sha256, routes_file_path=routes_file_path)
+        network.save(cache_dir)
+        return network
+
+    def save(self, cache_dir: Path | str) -> None:
+        cache_dir = Path(cache_dir)
+        # Пишем во временную директорию и переименовываем, чтобы параллельные процессы не прочитали недописанный кэш
+        tmp_dir = cache_dir.with_name(f"{cache_dir.name}.{os.getpid()}.tmp")
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        np.save(tmp_dir / "point_names.npy", np.array(self.point_names, dtype=str))
+        np.save(tmp_dir / "route_names.npy", np.array(self.route_names, dtype=str))
+        for array_name in self.__array_names:
+            np.save(tmp_dir / f"{array_name}.npy", np.ascontiguousarray(getattr(self, array_name)))
+        try:
+            os.replace(tmp_dir, cache_dir)
+        except OSError:
+            # Кэш уже сохранил другой процесс
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, cache_dir: Path | str, routes_file_path: Path | str | None = None) -> "RouteNetwork":
+        cache_dir = Path(cache_dir)
+        arrays = {
+            array_name: np.load(cache_dir / f"{array_name}.npy", mmap_mode="r")
+            for array_name in cls.__array_names
+        }
+        return cls(
+            point_names=np.load(cache_dir / "point_names.npy").tolist(),
+            route_names=np.load(cache_dir / "route_names.npy").tolist(),
+            routes_file_path=Path(routes_file_path) if routes_file_path is not None else None,
+            **arrays,
+        )
+
+    @property
+    def routes_num(self) -> int:
+        return len(self.route_names)
+
+    def get_route(self, route_id: int) -> Route:
+        if self._routes is not None:
+            return self._routes[route_id]
+
+        # Маршрут из кэша собирается по требованию (в нем только конечные точки)
+        start, end = self.geometry_offsets[route_id]
+        geometry = {"type": "LineString", "coordinates": []}
+        if start != -1 and self._routes_file_path is not None:
+            geometry = LazyGeometry(self._routes_file_path, int(start), int(end))
+        point_0_id, point_1_id = self.route_points[route_id]
+        return Route(
+            type="Feature",
+            geometry=geometry,
+            properties=Properties(
+                distance=float(self.route_distances[route_id]),
+                points=[{"name": self.point_names[point_0_id]}, {"name": self.point_names[point_1_id]}],
+            ),
+        )
@@ -0,0 +1,62 @@
+import hashlib
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import shortest_path
+
+
+def all_pairs_shortest_paths(distances: np.ndarray) -> np.ndarray:
+    """ Кратчайшие расстояния между всеми парами точек (Дейкстра по разреженному графу ребер)
+
+    :param distances: Матрица прямых расстояний (np.inf - ребра нет)
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    # В граф попадают только существующие ребра, диагональ не нужна
+    rows, cols = np.nonzero(np.isfinite(distances) & ~np.eye(distances.shape[0], dtype=bool))
+    edges = csr_matrix((distances[rows, cols], (rows, cols)), shape=distances.shape)
+    return shortest_path(edges, method="D", directed=False)
+
+
+def complete_distance_matrix(distances: np.ndarray) -> np.ndarray:
+    """ Дополняет разреженную матрицу: прямой маршрут, если он есть, иначе кратчайший путь по графу """
+    return np.where(np.isfinite(distances), distances, all_pairs_shortest_paths(distances))
+
+
+class ShortestPathCache:
+    """ Кэш дополненных матриц расстояний в памяти процесса
+
+        Ключ строится по sha256 файла маршрутов (тот же, что в train.build_training_metadata)
+        и именам точек. Если хеша файла нет - по самим прямым расстояниям.
+        На диске дополненная матрица хранится в бинарном кэше RouteNetwork рядом с файлом маршрутов.
+    """
+
+    def __init__(self):
+        self._memo: dict[str, np.ndarray] = {}
+
+    @staticmethod
+    def get_key(point_names: list[str], distances: np.ndarray, routes_sha256: str | None = None) -> str:
+        digest = hashlib.sha256()
+        digest.update("\n".join(point_names).encode())
+        if routes_sha256 is not None:
+            digest.update(routes_sha256.encode())
+        else:
+            digest.update(np.ascontiguousarray(distances, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def get_or_compute(
+            self,
+            point_names: list[str],
+            distances: np.ndarray,
+            routes_sha256: str | None = None
+    ) -> np.ndarray:
+        key = self.get_key(point_names, distances, routes_sha256)
+        completed = self._memo.get(key)
+        if completed is None:
+            completed = complete_distance_matrix(distances)
+            # Матрица общая для всех инстансов с теми же маршрутами, ее нельзя изменять
+            completed.setflags(write=False)
+            self._memo[key] = completed
+        return completed
+
+
+SHORTEST_PATH_CACHE = ShortestPathCache()
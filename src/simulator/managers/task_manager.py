@@ -1,4 +1,3 @@
-from src.simulator.builder import get_requests_constraints
 from src.simulator.environment import Environment
 from src.simulator.units.request import Request
 from src.simulator.units.truck import Truck
@@ -10,7 +9,7 @@ class TaskManager:
 
     def __set_requests_per_truck(self, selection: tuple[int], env: Environment) -> dict[str, list[Request]]:
         # Получаем ограничения по заявкам
-        requests_constraints = get_requests_constraints(env, with_missed=False)
+        requests_constraints = env.constraints
 
         # Проходимся по выборке и присваиваем машинам их заявки
         requests_per_truck: dict[str, list[Request]] = {}
@@ -22,9 +21,9 @@ class TaskManager:
             if truck.info.name not in requests_per_truck:
                 requests_per_truck[truck.info.name] = []
 
-            assert truck_id in requests_constraints[request_id], \
+            assert requests_constraints.is_allowed(request_id, truck_id), \
                 (f"На заявку {request_id} была поставлена машина {truck_id}, "
-                 f"не входящая в ограничения {requests_constraints[request_id]}")
+                 f"не входящая в ограничения {requests_constraints.get_allowed_trucks(with_missed=False)[request_id]}")
             requests_per_truck[truck.info.name].append(request)
 
         # Сортируем заявки по дате начала временного окна
@@ -0,0 +1,223 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.simulator.compiled_environment import CompiledEnvironment
+from src.simulator.managers.constraint_index import ConstraintIndex
+
+
+@dataclass(frozen=True)
+class SimulationCheckpoints:
+    """ Состояние машин каждой выборки перед заявками с индексами 0, stride, 2*stride, ...
+
+        :arg stride: Шаг (в заявках) между чекпоинтами
+        :arg selections: Выборки, для которых записаны чекпоинты, shape=(кол-во выборок, кол-во заявок)
+        :arg truck_points: id точек машин, shape=(кол-во выборок, кол-во чекпоинтов, кол-во машин)
+        :arg truck_times: Время освобождения машин, shape как у truck_points
+        :arg missed_counts: Кол-во пропущенных заявок к чекпоинту, shape=(кол-во выборок, кол-во чекпоинтов)
+    """
+    stride: int
+    selections: np.ndarray
+    truck_points: np.ndarray
+    truck_times: np.ndarray
+    missed_counts: np.ndarray
+
+
+class BatchSimulator:
+    """ Векторизованная симуляция сразу нескольких выборок (например, популяции ГА)
+
+        Заявки в env отсортированы по началу временного окна, поэтому обход заявок по индексу
+        совпадает с порядком, в котором Simulator.run обходит заявки каждой машины.
+        На каждом шаге одна и та же заявка обрабатывается сразу для всех выборок.
+        Состояние машин перед заявкой зависит только от генов до нее, поэтому выборку можно
+        продолжить с чекпоинта родителя, у которого совпадает префикс генов.
+    """
+
+    def __init__(self, compiled_env: CompiledEnvironment, constraint_index: ConstraintIndex):
+        self._compiled_env = compiled_env
+        self._constraint_index = constraint_index
+
+    @property
+    def compiled_env(self) -> CompiledEnvironment:
+        return self._compiled_env
+
+    def _check_selections(self, selections: np.ndarray) -> np.ndarray:
+        selections = np.asarray(selections, dtype=np.int64)
+        assert selections.ndim == 2 and selections.shape[1] == self._compiled_env.requests_num, \
+            "Выборки должны иметь shape=(кол-во выборок, кол-во заявок)"
+        self._check_constraints(selections)
+        return selections
+
+    def _check_constraints(self, selections: np.ndarray) -> None:
+        assigned = selections != -1
+        assert np.all((selections >= -1) & (selections < self._compiled_env.trucks_num)), \
+            "В выборке есть несуществующие id машин"
+        request_ids = np.broadcast_to(np.arange(selections.shape[1]), selections.shape)
+        allowed = self._constraint_index.allowed_matrix[request_ids, np.where(assigned, selections, 0)]
+        violations = assigned & ~allowed
+        assert not np.any(violations), \
+            f"Машины не входят в ограничения заявок {np.flatnonzero(violations.any(axis=0)).tolist()}"
+
+    def run(self, selections: np.ndarray) -> np.ndarray:
+        """ Симулирует матрицу выборок shape=(кол-во выборок, кол-во заявок)
+
+        :return: Кол-во пропущенных заявок для каждой выборки
+        """
+        selections = self._check_selections(selections)
+        selections_num = selections.shape[0]
+        truck_points = np.tile(self._compiled_env.truck_start_points, (selections_num, 1))
+        truck_times = np.zeros(truck_points.shape, dtype=np.int64)
+        missed_counts = np.zeros(selections_num, dtype=np.int64)
+
+        self._simulate(selections, np.zeros(selections_num, dtype=np.int64), truck_points, truck_times, missed_counts)
+        return missed_counts
+
+    def run_with_checkpoints(
+            self,
+            selections: np.ndarray,
+            checkpoint_stride: int,
+            parent_checkpoints: SimulationCheckpoints = None,
+            parent_ids: np.ndarray = None
+    ) -> tuple[np.ndarray, SimulationCheckpoints]:
+        """ Симулирует выборки с записью чекпоинтов
+
+        Если переданы чекпоинты родителей, то выборка продолжается с последнего чекпоинта
+        родителя, до которого гены выборки и родителя совпадают, и симулируется только хвост.
+
+        :param selections: Матрица выборок shape=(кол-во выборок, кол-во заявок)
+        :param checkpoint_stride: Шаг между чекпоинтами (игнорируется, если есть parent_checkpoints)
+        :param parent_checkpoints: Чекпоинты ранее просимулированных выборок
+        :param parent_ids: Индекс родителя в parent_checkpoints для каждой выборки (-1 - без родителя)
+        :return: Кол-во пропущенных заявок для каждой выборки и чекпоинты выборок
+        """
+        selections = self._check_selections(selections)
+        selections_num, requests_num = selections.shape
+        if parent_checkpoints is not None:
+            checkpoint_stride = parent_checkpoints.stride
+        assert checkpoint_stride >= 1, "Шаг между чекпоинтами должен быть >= 1"
+        checkpoints_num = requests_num // checkpoint_stride + 1
+
+        truck_points = np.tile(self._compiled_env.truck_start_points, (selections_num, 1))
+        truck_times = np.zeros(truck_points.shape, dtype=np.int64)
+        missed_counts = np.zeros(selections_num, dtype=np.int64)
+        start_request_ids = np.zeros(selections_num, dtype=np.int64)
+        checkpoints = SimulationCheckpoints(
+            stride=checkpoint_stride,
+            selections=selections,
+            truck_points=np.empty((selections_num, checkpoints_num, truck_points.shape[1]), dtype=np.int64),
+            truck_times=np.empty((selections_num, checkpoints_num, truck_points.shape[1]), dtype=np.int64),
+            missed_counts=np.empty((selections_num, checkpoints_num), dtype=np.int64),
+        )
+
+        if parent_checkpoints is not None:
+            assert parent_ids is not None and len(parent_ids) == selections_num, \
+                "Для каждой выборки нужен индекс родителя"
+            self.__resume_from_parents(
+                parent_checkpoints, np.asarray(parent_ids, dtype=np.int64), checkpoints,
+                start_request_ids, truck_points, truck_times, missed_counts
+            )
+
+        self._simulate(selections, start_request_ids, truck_points, truck_times, missed_counts, checkpoints)
+        return missed_counts, checkpoints
+
+    @staticmethod
+    def __resume_from_parents(
+            parent_checkpoints: SimulationCheckpoints,
+            parent_ids: np.ndarray,
+            checkpoints: SimulationCheckpoints,
+            start_request_ids: np.ndarray,
+            truck_points: np.ndarray,
+            truck_times: np.ndarray,
+            missed_counts: np.ndarray
+    ) -> None:
+        selections = checkpoints.selections
+        requests_num = selections.shape[1]
+        with_parent = np.flatnonzero(parent_ids != -1)
+        parent_ids = parent_ids[with_parent]
+
+        # Длина общего префикса генов выборки и ее родителя
+        mismatches = selections[with_parent] != parent_checkpoints.selections[parent_ids]
+        prefix_lengths = np.where(mismatches.any(axis=1), mismatches.argmax(axis=1), requests_num)
+        checkpoint_ids = prefix_lengths // checkpoints.stride
+        start_request_ids[with_parent] = checkpoint_ids * checkpoints.stride
+
+        truck_points[with_parent] = parent_checkpoints.truck_points[parent_ids, checkpoint_ids]
+        truck_times[with_parent] = parent_checkpoints.truck_times[parent_ids, checkpoint_ids]
+        missed_counts[with_parent] = parent_checkpoints.missed_counts[parent_ids, checkpoint_ids]
+
+        # Чекпоинты до точки продолжения у выборки те же, что и у родителя
+        checkpoints.truck_points[with_parent] = parent_checkpoints.truck_points[parent_ids]
+        checkpoints.truck_times[with_parent] = parent_checkpoints.truck_times[parent_ids]
+        checkpoints.missed_counts[with_parent] = parent_checkpoints.missed_counts[parent_ids]
+
+    def _simulate(
+            self,
+            selections: np.ndarray,
+            start_request_ids: np.ndarray,
+            truck_points: np.ndarray,
+            truck_times: np.ndarray,
+            missed_counts: np.ndarray,
+            checkpoints: SimulationCheckpoints = None
+    ) -> None:
+        """ Продолжает симуляцию каждой выборки с заявки start_request_ids (состояние изменяется на месте)
+
+        Выборки упорядочиваются по заявке старта, тогда на каждой заявке активны первые n выборок
+        и вычисления идут по срезу, а не по всей матрице.
+        """
+        compiled_env = self._compiled_env
+        order = np.argsort(start_request_ids, kind="stable")
+        sorted_start_request_ids = start_request_ids[order]
+        ordered_selections = selections[order]
+        ordered_truck_points = truck_points[order]
+        ordered_truck_times = truck_times[order]
+        ordered_missed_counts = missed_counts[order]
+        selection_ids = np.arange(len(order))
+
+        first_request_id = int(sorted_start_request_ids[0]) if len(order) else compiled_env.requests_num
+        for request_id in range(first_request_id, compiled_env.requests_num + 1):
+            active_num = int(np.searchsorted(sorted_start_request_ids, request_id, side="right"))
+            if checkpoints is not None and request_id % checkpoints.stride == 0:
+                checkpoint_id = request_id // checkpoints.stride
+                active_order = order[:active_num]
+                checkpoints.truck_points[active_order, checkpoint_id] = ordered_truck_points[:active_num]
+                checkpoints.truck_times[active_order, checkpoint_id] = ordered_truck_times[:active_num]
+                checkpoints.missed_counts[active_order, checkpoint_id] = ordered_missed_counts[:active_num]
+            if request_id == compiled_env.requests_num:
+                break
+
+            active_ids = selection_ids[:active_num]
+            truck_ids = ordered_selections[:active_num, request_id]
+            assigned = truck_ids != -1
+            truck_ids = np.where(assigned, truck_ids, 0)
+
+            current_points = ordered_truck_points[active_ids, truck_ids]
+            current_times = ordered_truck_times[active_ids, truck_ids]
+            load_point = compiled_env.request_load_points[request_id]
+            unload_point = compiled_env.request_unload_points[request_id]
+
+            travel_time_to_load = compiled_env.get_travel_times(
+                truck_ids, request_id, current_points, load_point, with_cargo=False
+            )
+            completed = assigned & (
+                current_times + travel_time_to_load <= compiled_env.request_window_starts[request_id]
+            )
+            ordered_missed_counts[:active_num] += ~completed
+
+            request_times = (
+                travel_time_to_load
+                + compiled_env.get_cargo_times(truck_ids, request_id, is_loading_process=True)
+                + compiled_env.get_travel_times(
+                    truck_ids, request_id, np.full(active_num, load_point), unload_point, with_cargo=True
+                )
+                + compiled_env.get_cargo_times(truck_ids, request_id, is_loading_process=False)
+            )
+
+            completed_selection_ids = active_ids[completed]
+            completed_truck_ids = truck_ids[completed]
+            ordered_truck_points[completed_selection_ids, completed_truck_ids] = unload_point
+            ordered_truck_times[completed_selection_ids, completed_truck_ids] += \
+                request_times[completed].astype(np.int64)
+
+        truck_points[order] = ordered_truck_points
+        truck_times[order] = ordered_truck_times
+        missed_counts[order] = ordered_missed_counts
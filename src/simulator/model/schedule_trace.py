@@ -0,0 +1,76 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.simulator.compiled_environment import CompiledEnvironment
+
+
+@dataclass
+class ScheduleTrace:
+    """ Поколоночная трасса симуляции: значения по id заявки
+
+        Для заявок без машины (truck_ids == -1) остальные колонки не заполняются (0).
+        Для пропущенных заявок заполнены departure_times, load_arrival_times и slacks
+        (видно, насколько машина опоздала), а времена погрузки и разгрузки равны 0.
+
+        :arg truck_ids: id назначенной машины (-1 - не назначена)
+        :arg departure_times: Время, когда машина освобождается и выезжает на заявку
+        :arg load_arrival_times: Время прибытия в точку погрузки
+        :arg load_end_times: Время окончания погрузки
+        :arg unload_end_times: Время окончания разгрузки (новое время освобождения машины)
+        :arg slacks: Запас до начала временного окна (начало окна - время прибытия на погрузку)
+        :arg served: Выполнена ли заявка
+    """
+    truck_ids: np.ndarray
+    departure_times: np.ndarray
+    load_arrival_times: np.ndarray
+    load_end_times: np.ndarray
+    unload_end_times: np.ndarray
+    slacks: np.ndarray
+    served: np.ndarray
+
+    @classmethod
+    def empty(cls, requests_num: int) -> "ScheduleTrace":
+        return cls(
+            truck_ids=np.full(requests_num, -1, dtype=np.int64),
+            departure_times=np.zeros(requests_num, dtype=np.int64),
+            load_arrival_times=np.zeros(requests_num, dtype=np.int64),
+            load_end_times=np.zeros(requests_num, dtype=np.int64),
+            unload_end_times=np.zeros(requests_num, dtype=np.int64),
+            slacks=np.zeros(requests_num, dtype=np.int64),
+            served=np.zeros(requests_num, dtype=bool),
+        )
+
+    def record(
+            self,
+            compiled_env: CompiledEnvironment,
+            truck_id: int,
+            request_id: int,
+            truck_point: int,
+            current_time: int,
+            task_completed: bool
+    ) -> None:
+        load_point = compiled_env.request_load_points[request_id]
+        load_arrival_time = current_time + int(compiled_env.get_travel_times(
+            truck_id, request_id, truck_point, load_point, with_cargo=False
+        ))
+
+        self.truck_ids[request_id] = truck_id
+        self.departure_times[request_id] = current_time
+        self.load_arrival_times[request_id] = load_arrival_time
+        self.slacks[request_id] = compiled_env.request_window_starts[request_id] - load_arrival_time
+        self.served[request_id] = task_completed
+        if not task_completed:
+            return
+
+        load_end_time = load_arrival_time + int(compiled_env.get_cargo_times(
+            truck_id, request_id, is_loading_process=True
+        ))
+        self.load_end_times[request_id] = load_end_time
+        self.unload_end_times[request_id] = (
+            load_end_time
+            + int(compiled_env.get_travel_times(
+                truck_id, request_id, load_point, compiled_env.request_unload_points[request_id], with_cargo=True
+            ))
+            + int(compiled_env.get_cargo_times(truck_id, request_id, is_loading_process=False))
+        )
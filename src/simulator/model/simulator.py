@@ -1,32 +1,46 @@
-import math
+import numpy as np
 
 from src.simulator.environment import Environment
 from src.simulator.managers.task_manager import TaskManager
+from src.simulator.model.batch_simulator import BatchSimulator, SimulationCheckpoints
+from src.simulator.model.schedule_trace import ScheduleTrace
 from src.simulator.units.point import Point
-from src.simulator.units.request import Request
-from src.simulator.units.truck import Truck, Position
+from src.simulator.units.truck import Truck
 
 
 class Simulator:
+    """ Симулятор выборки (id машины на каждую заявку)
+
+        Состояние машин во время прогона - это только id текущей точки и время освобождения,
+        поэтому pydantic-модели машин из env не копируются и не изменяются.
+        Откат невыполненной заявки - это просто отказ от записи нового состояния.
+    """
+
     def __init__(self, env: Environment = None):
+        """
+        :param env: Окружение симуляции
+        """
         self._env = env
+        self._batch_simulator: BatchSimulator | None = None
 
     def _request_simulation(
             self,
-            truck: Truck,
-            request: Request,
+            truck_id: int,
+            request_id: int,
+            truck_point: int,
             current_time: int
     ) -> (bool, int):
         task_completed, request_time = self._load_process(
-            truck=truck,
-            request=request,
+            truck_id=truck_id,
+            request_id=request_id,
+            truck_point=truck_point,
             current_time=current_time
         )
 
         if task_completed:
             request_time += self._unload_process(
-                truck=truck,
-                request=request
+                truck_id=truck_id,
+                request_id=request_id
             )
         else:
             return task_completed, 0
@@ -34,64 +48,56 @@ class Simulator:
 
     def __check_truck_be_on_time_for_request(
             self,
-            request: Request,
+            request_id: int,
             current_time: int,
             request_time: int,
             travel_time: int
     ) -> bool:
-        if current_time + request_time + travel_time <= request.point_to_load.date_start_window:
+        if current_time + request_time + travel_time <= self._env.compiled.request_window_starts[request_id]:
             return True
         else:
             return False
 
     def _cargo_process(
             self,
-            truck: Truck,
-            request: Request,
+            truck_id: int,
+            request_id: int,
             is_loading_process: bool
-    ):
-        if is_loading_process:
-            process_speed = truck.cargo_params.loading_speed
-        else:
-            process_speed = truck.cargo_params.unloading_speed
-
-        cargo_time = math.ceil(request.volume / process_speed)
-        return cargo_time
+    ) -> int:
+        return int(self._env.compiled.get_cargo_times(truck_id, request_id, is_loading_process))
 
     def _load_process(
             self,
-            truck: Truck,
-            request: Request,
+            truck_id: int,
+            request_id: int,
+            truck_point: int,
             current_time: int
     ) -> (bool, int):
+        compiled_env = self._env.compiled
         request_time = 0
-        current_point: Point = truck.position.current_point
-        next_point: Point = request.point_to_load
-
-        travel_time = self._env.route_manager.calculate_travel_time_to_point(
-            truck=truck,
-            with_cargo=False,
-            request=request,
-            departure_point=current_point,
-            destination_point=next_point
-        )
+
+        travel_time = int(compiled_env.get_travel_times(
+            truck_ids=truck_id,
+            request_id=request_id,
+            departure_points=truck_point,
+            destination_point=compiled_env.request_load_points[request_id],
+            with_cargo=False
+        ))
 
         task_completed_flag = self.__check_truck_be_on_time_for_request(
-            request=request,
+            request_id=request_id,
             current_time=current_time,
             request_time=request_time,
             travel_time=travel_time
         )
 
         if task_completed_flag:
-            truck.position.set_current_point(next_point)
             request_time += travel_time
-            cargo_time = self._cargo_process(
-                truck=truck,
-                request=request,
+            request_time += self._cargo_process(
+                truck_id=truck_id,
+                request_id=request_id,
                 is_loading_process=True
             )
-            request_time += cargo_time
         else:
             return task_completed_flag, 0
 
@@ -99,29 +105,26 @@ class Simulator:
 
     def _unload_process(
             self,
-            truck: Truck,
-            request: Request
+            truck_id: int,
+            request_id: int
     ) -> int:
+        compiled_env = self._env.compiled
         request_time = 0
-        current_point: Point = truck.position.current_point
-        next_point: Point = request.point_to_unload
-
-        travel_time = self._env.route_manager.calculate_travel_time_to_point(
-            truck=truck,
-            with_cargo=True,
-            request=request,
-            departure_point=current_point,
-            destination_point=next_point
-        )
 
-        truck.position.set_current_point(next_point)
+        travel_time = int(compiled_env.get_travel_times(
+            truck_ids=truck_id,
+            request_id=request_id,
+            departure_points=compiled_env.request_load_points[request_id],
+            destination_point=compiled_env.request_unload_points[request_id],
+            with_cargo=True
+        ))
+
         request_time += travel_time
-        cargo_time = self._cargo_process(
-            truck=truck,
-            request=request,
+        request_time += self._cargo_process(
+            truck_id=truck_id,
+            request_id=request_id,
             is_loading_process=False
         )
-        request_time += cargo_time
 
         return request_time
 
@@ -133,73 +136,198 @@ class Simulator:
         current_time += request_time
         return current_time
 
-    def _reset_state(
+    def _get_truck_positions(self, truck_points: list[int]) -> list[Point]:
+        point_names = self._env.compiled.point_names
+        return [Point(name=point_names[point_id], id=point_id) for point_id in truck_points]
+
+    def _simulate_truck(
             self,
-            truck: Truck,
-            request: Request,
-            saved_position: Position,
-            missed_requests_ids: list[int],
-    ) -> (Truck, int):
-        truck.position = saved_position
-        missed_requests_ids.append(request.id)
-        return truck
-
-    def __get_copy_of_trucks(self) -> list[Truck]:
-        copied_trucks = []
-        for truck in self._env.trucks:
-            copied_truck = truck.model_copy(deep=True)
-            copied_trucks.append(copied_truck)
-        return copied_trucks
+            truck_id: int,
+            request_ids: list[int],
+            trace: ScheduleTrace = None
+    ) -> tuple[list[int], int, int]:
+        """ Симулирует заявки одной машины (в порядке начала временного окна)
+
+        :param trace: Трасса, в которую записываются времена заявок
+        :return: id пропущенных заявок, id конечной точки машины и время ее освобождения
+        """
+        compiled_env = self._env.compiled
+        missed_requests_ids = []
+        truck_point = int(compiled_env.truck_start_points[truck_id])
+        current_time = 0
+
+        # Для каждого заказа машины
+        for request_id in request_ids:
+            # Симулируем выполнение заказа
+            task_completed, request_time = self._request_simulation(
+                truck_id=truck_id,
+                request_id=request_id,
+                truck_point=truck_point,
+                current_time=current_time
+            )
+            if trace is not None:
+                trace.record(compiled_env, truck_id, request_id, truck_point, current_time, task_completed)
+
+            if task_completed:
+                # Сохраняем состояние, если заказ выполнен
+                truck_point = int(compiled_env.request_unload_points[request_id])
+                current_time = self._save_state(request_time=request_time, current_time=current_time)
+            else:
+                # Иначе состояние машины не меняется
+                missed_requests_ids.append(request_id)
+
+        return missed_requests_ids, truck_point, current_time
 
     def run(self, selection: tuple[int], env: Environment = None) -> tuple[list[int], list[Point], list[int]]:
+        missed_requests_ids, truck_points, truck_available_times = self._run(selection, env)
+        return missed_requests_ids, self._get_truck_positions(truck_points), truck_available_times
+
+    def run_with_trace(
+            self,
+            selection: tuple[int],
+            env: Environment = None
+    ) -> tuple[list[int], list[Point], list[int], ScheduleTrace]:
+        """ То же, что run, но дополнительно возвращает трассу с временами по каждой заявке """
+        trace = ScheduleTrace.empty(len(selection))
+        missed_requests_ids, truck_points, truck_available_times = self._run(selection, env, trace=trace)
+        return missed_requests_ids, self._get_truck_positions(truck_points), truck_available_times, trace
+
+    def _run(
+            self,
+            selection: tuple[int],
+            env: Environment = None,
+            trace: ScheduleTrace = None
+    ) -> tuple[list[int], list[int], list[int]]:
+        """
+        :param trace: Трасса, которую нужно заполнить (None - без трассировки)
+        :return: id пропущенных заявок, id конечных точек машин и время их освобождения
+        """
         if env is not None:
             self._env = env
         assert self._env is not None, "Не передано env"
+        compiled_env = self._env.compiled
 
         # Присваиваем каждой машине список своих заказов с помощью TaskManager
         task_manager = TaskManager(selection, self._env)
 
-        # Получаем копии машин, чтобы не изменить их в env
-        trucks = self.__get_copy_of_trucks()
-
         # Собираем все id пропущенных задач
-        missed_requests_ids = []
-        for request_id, truck_id in enumerate(selection):
-            if truck_id == -1:
-                missed_requests_ids.append(request_id)
+        missed_requests_ids = [request_id for request_id, truck_id in enumerate(selection) if truck_id == -1]
+
+        # Состояние машин: id текущей точки и время освобождения
+        truck_points = compiled_env.truck_start_points.tolist()
+        truck_available_times = [0] * compiled_env.trucks_num
 
         # В цикле по каждой машине
-        truck_available_times = [0] * len(trucks)
-        for truck in trucks:
+        for truck in self._env.trucks:
             truck: Truck
-            current_time = 0
-
-            # Для каждого заказа машины
-            for request in task_manager.iter_by(truck.info.name):
-                # Сохраняем состояние машины до выполнения заказа
-                saved_position: Position = truck.position.model_copy(deep=True)
-
-                # Симулируем выполнение заказа
-                task_completed, request_time = self._request_simulation(
-                    truck=truck,
-                    request=request,
-                    current_time=current_time
-                )
-
-                if task_completed:
-                    # Сохраняем состояние, если заказ выполнен
-                    current_time = self._save_state(request_time=request_time, current_time=current_time)
-                else:
-                    # Откатываем изменения, если заказ не выполнен
-                    truck = self._reset_state(
-                        truck=truck,
-                        request=request,
-                        saved_position=saved_position,
-                        missed_requests_ids=missed_requests_ids
-                    )
-
-            truck_available_times[truck.id] = current_time
-
-        truck_positions = [truck.position.current_point.model_copy(deep=True) for truck in trucks]
-
-        return missed_requests_ids, truck_positions, truck_available_times
+            request_ids = [request.id for request in task_manager.iter_by(truck.info.name)]
+            truck_missed_requests_ids, truck_points[truck.id], truck_available_times[truck.id] = (
+                self._simulate_truck(truck.id, request_ids, trace)
+            )
+            missed_requests_ids.extend(truck_missed_requests_ids)
+
+        return missed_requests_ids, truck_points, truck_available_times
+
+    def run_batch(self, selections: np.ndarray, env: Environment = None) -> np.ndarray:
+        """ Симулирует сразу матрицу выборок shape=(кол-во выборок, кол-во заявок)
+
+        :return: Кол-во пропущенных заявок для каждой выборки (совпадает с len(missed) из run)
+        """
+        if env is not None:
+            self._env = env
+        assert self._env is not None, "Не передано env"
+
+        return self._get_batch_simulator().run(selections)
+
+    def run_batch_with_checkpoints(
+            self,
+            selections: np.ndarray,
+            checkpoint_stride: int = 1,
+            parent_checkpoints: SimulationCheckpoints = None,
+            parent_ids: np.ndarray = None,
+            env: Environment = None
+    ) -> tuple[np.ndarray, SimulationCheckpoints]:
+        """ То же, что run_batch, но с записью чекпоинтов состояния машин
+
+        Выборки с родителем (parent_ids != -1) продолжаются с чекпоинта родителя в точке,
+        до которой их гены совпадают (см. BatchSimulator.run_with_checkpoints).
+
+        :return: Кол-во пропущенных заявок для каждой выборки и чекпоинты выборок
+        """
+        if env is not None:
+            self._env = env
+        assert self._env is not None, "Не передано env"
+
+        return self._get_batch_simulator().run_with_checkpoints(
+            selections, checkpoint_stride, parent_checkpoints=parent_checkpoints, parent_ids=parent_ids
+        )
+
+    def _get_batch_simulator(self) -> BatchSimulator:
+        if self._batch_simulator is None or self._batch_simulator.compiled_env is not self._env.compiled:
+            self._batch_simulator = BatchSimulator(self._env.compiled, self._env.constraints)
+        return self._batch_simulator
+
+    def start_session(self, env: Environment = None) -> "SimulatorSession":
+        if env is not None:
+            self._env = env
+        assert self._env is not None, "Не передано env"
+        # Отдельный Simulator, чтобы сессию не сбил последующий run на другом env
+        return SimulatorSession(Simulator(self._env), self._env)
+
+
+class SimulatorSession:
+    """ Инкрементальная симуляция выборки, которая растет только добавлением в конец
+
+        Заявки в env отсортированы по началу временного окна, а TaskManager сортирует заявки
+        каждой машины по тому же ключу (устойчиво), поэтому добавленная заявка всегда последняя
+        у своей машины. Значит достаточно продвинуть только выбранную машину, а результат
+        совпадает с Simulator.run на всей выборке (с точностью до порядка пропущенных id).
+        Состояние машин хранится в массивах CompiledEnvironment: id текущей точки и время.
+    """
+
+    def __init__(self, simulator: Simulator, env: Environment):
+        self._simulator = simulator
+        self._env = env
+        self._compiled_env = env.compiled
+        self._requests_constraints = env.constraints
+        self._truck_points = self._compiled_env.truck_start_points.tolist()
+        self._truck_available_times = [0] * self._compiled_env.trucks_num
+        self._missed_requests_ids = []
+        self._selection = []
+
+    @property
+    def selection(self) -> tuple[int]:
+        return tuple(self._selection)
+
+    def append(self, truck_id: int) -> tuple[list[int], list[Point], list[int]]:
+        request_id = len(self._selection)
+        assert request_id < self._env.requests_num, "Все заявки уже распределены"
+
+        self._selection.append(truck_id)
+        if truck_id == -1:
+            self._missed_requests_ids.append(request_id)
+            return self.result()
+
+        assert self._requests_constraints.is_allowed(request_id, truck_id), \
+            (f"На заявку {request_id} была поставлена машина {truck_id}, "
+             f"не входящая в ограничения {self._requests_constraints.get_allowed_trucks(with_missed=False)[request_id]}")
+
+        task_completed, request_time = self._simulator._request_simulation(
+            truck_id=truck_id,
+            request_id=request_id,
+            truck_point=self._truck_points[truck_id],
+            current_time=self._truck_available_times[truck_id]
+        )
+        if task_completed:
+            self._truck_points[truck_id] = int(self._compiled_env.request_unload_points[request_id])
+            self._truck_available_times[truck_id] = self._simulator._save_state(
+                request_time=request_time,
+                current_time=self._truck_available_times[truck_id]
+            )
+        else:
+            self._missed_requests_ids.append(request_id)
+        return self.result()
+
+    def result(self) -> tuple[list[int], list[Point], list[int]]:
+        truck_positions = self._simulator._get_truck_positions(self._truck_points)
+        return list(self._missed_requests_ids), truck_positions, list(self._truck_available_times)
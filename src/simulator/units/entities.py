@@ -1,48 +1,104 @@
-from collections import deque
-from typing import Type
+from functools import reduce
+from operator import attrgetter, getitem, index as as_index
+from typing import Iterator, Type
 
 import numpy as np
 from pydantic import ValidationError
 
 
 class Entities:
+    """ Контейнер сущностей (машин или заявок) с доступом по id и по имени
 
-    def __init__(self, data: list[dict], EntityClass: Type):
+        Итерация повторно-входимая (каждый for получает свой итератор), а поля сущностей
+        можно получить столбцом NumPy (см. get_column).
+    """
+
+    def __init__(self, data: list[dict], EntityClass: Type, trusted: bool = False):
+        """
+        :param data: Данные сущностей
+        :param EntityClass: Класс сущности (pydantic-модель)
+        :param trusted: Данные заведомо корректны (выход InputDataGenerator) - модели не строятся при создании,
+                а только при первом обращении к сущностям, столбцы читаются прямо из данных
+        """
+        self.__entity_class = EntityClass
         self.__named_dict = {}
         self.__list_by_id = []
+        # Столбцы полей сущностей, строятся при первом обращении
+        self.__columns: dict[tuple[str, type | None], np.ndarray] = {}
+        # Данные сущностей, по которым еще не построены модели (только при trusted)
+        self.__data: list[dict] | None = None
+
+        if trusted:
+            for entity_id, elem in enumerate(data):
+                elem["id"] = entity_id
+            self.__data = data
+            return
+        self.__build_entities(data)
 
+    def __build_entities(self, data: list[dict]) -> None:
         try:
             for elem in data:
                 elem["id"] = len(self.__list_by_id)
-                new_entity = EntityClass(**elem)
+                new_entity = self.__entity_class(**elem)
                 self.__list_by_id.append(new_entity)
                 self.__named_dict[new_entity.info.name] = new_entity
         except ValidationError as e:
             print(e.json())
             raise
 
+    def __materialize(self) -> None:
+        if self.__data is not None:
+            data, self.__data = self.__data, None
+            self.__build_entities(data)
+
     def __getitem__(self, index):
-        if isinstance(index, int) | isinstance(index, np.integer):
-            return self.__list_by_id[index]
-        elif isinstance(index, str):
+        self.__materialize()
+        if isinstance(index, str):
             return self.__named_dict[index]
-        elif isinstance(index, float) | isinstance(index, np.floating):
+        try:
+            # int и целые типы NumPy
+            return self.__list_by_id[as_index(index)]
+        except TypeError:
+            pass
+        if isinstance(index, float) | isinstance(index, np.floating):
             if index == int(index):
                 return self.__list_by_id[int(index)]
             else:
                 raise ValueError('Float index')
-        else:
-            raise NotImplementedError('Unsupported type')
-
-    def __iter__(self):
-        self.__remaining_requests = deque(self.__list_by_id)
-        return self
+        raise NotImplementedError('Unsupported type')
 
-    def __next__(self):
-        try:
-            return self.__remaining_requests.popleft()
-        except:
-            raise StopIteration
+    def __iter__(self) -> Iterator:
+        self.__materialize()
+        return iter(self.__list_by_id)
 
     def __len__(self):
-        return len(self.__list_by_id)
\ No newline at end of file
+        if self.__data is not None:
+            return len(self.__data)
+        return len(self.__list_by_id)
+
+    def get_column(self, field_path: str, dtype: type | None = None) -> np.ndarray:
+        """ Значения поля всех сущностей по id, например get_column("point_to_load.date_start_window")
+
+        Столбец считается один раз и возвращается только для чтения, поэтому подходит
+        для полей, которые не меняются в ходе симуляции (объемы, окна, параметры машин).
+
+        :param field_path: Путь до поля через точку
+        :param dtype: Тип элементов массива
+        """
+        key = (field_path, dtype)
+        column = self.__columns.get(key)
+        if column is None:
+            column = np.array(self.__get_values(field_path), dtype=dtype)
+            column.setflags(write=False)
+            self.__columns[key] = column
+        return column
+
+    def __get_values(self, field_path: str) -> list:
+        if self.__data is not None:
+            keys = field_path.split(".")
+            try:
+                return [reduce(getitem, keys, elem) for elem in self.__data]
+            except KeyError:
+                # Поля нет в данных (значение по умолчанию модели) - берем из моделей
+                self.__materialize()
+        return list(map(attrgetter(field_path), self.__list_by_id))
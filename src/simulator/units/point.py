@@ -3,6 +3,8 @@ from pydantic import BaseModel, ConfigDict
 
 class Point(BaseModel):
     name: str
+    # id из PointTable (проставляется в get_env), по нему точки сравниваются внутри симуляции
+    id: int | None = None
 
 class RoutePoint(Point):
     pass
@@ -1,28 +1,67 @@
+from typing import Callable
+
+import numpy as np
+
 from src.simulator.units.entities import Entities
-from src.simulator.units.request import Request
-from src.simulator.units.truck import Truck
 
+# Требование по заявкам и машинам возвращает булеву матрицу shape=(кол-во заявок, кол-во машин),
+# True - машину можно поставить на заявку
+Requirement = Callable[[Entities, Entities], np.ndarray]
 
-def apply_requirements(requests: Entities, trucks: Entities, with_missed: bool):
-    requests_constrains = [[i for i in range(len(trucks))]] * len(requests)
-    requirements = [apply_trucks_capacity_requirement]
 
-    for requirement in requirements:
-        requests_constrains = requirement(requests_constrains, requests, trucks)
+def trucks_capacity_requirement(requests: Entities, trucks: Entities) -> np.ndarray:
+    # Машина подходит, если ее вместимость не меньше объема заявки
+    return trucks.get_column("cargo_params.capacity")[np.newaxis, :] >= requests.get_column("volume")[:, np.newaxis]
+
+
+# Требования, которые применяются ко всем Environment (объединяются через логическое И)
+_REQUIREMENTS: list[Requirement] = [trucks_capacity_requirement]
+
+
+def register_requirement(requirement: Requirement) -> Requirement:
+    """ Добавляет требование ко всем Environment, которые посчитают ограничения после регистрации
+
+    Можно использовать как декоратор. Требование должно считать матрицу целиком
+    (через столбцы Entities.get_column и broadcasting), а не перебирать пары заявка-машина.
+    """
+    if requirement not in _REQUIREMENTS:
+        _REQUIREMENTS.append(requirement)
+    return requirement
 
-    if with_missed:
-        for constrain in requests_constrains:
-            constrain.append(-1)
 
-    return requests_constrains
+def unregister_requirement(requirement: Requirement) -> None:
+    _REQUIREMENTS.remove(requirement)
+
+
+def get_requirements() -> tuple[Requirement, ...]:
+    return tuple(_REQUIREMENTS)
+
+
+def build_allowed_matrix(
+        requests: Entities,
+        trucks: Entities,
+        requirements: tuple[Requirement, ...] | None = None
+) -> np.ndarray:
+    """ Матрица допустимых назначений shape=(кол-во заявок, кол-во машин)
+
+    :param requirements: Требования (по умолчанию - все зарегистрированные)
+    """
+    if requirements is None:
+        requirements = get_requirements()
+
+    allowed_matrix = np.ones((len(requests), len(trucks)), dtype=bool)
+    for requirement in requirements:
+        requirement_matrix = np.asarray(requirement(requests, trucks), dtype=bool)
+        assert requirement_matrix.shape == allowed_matrix.shape, \
+            f"Требование {getattr(requirement, '__name__', requirement)} вернуло матрицу неверной формы"
+        allowed_matrix &= requirement_matrix
+    return allowed_matrix
 
 
-def apply_trucks_capacity_requirement(requests_constrains: list[list[int]], requests: Entities, trucks: Entities):
-    fixed_requests_constrains = [[] for _ in range(len(requests))]
-    for request_id, constrains in enumerate(requests_constrains):
-        for truck_id in constrains:
-            truck: Truck = trucks[truck_id]
-            request: Request = requests[request_id]
-            if truck.cargo_params.capacity >= request.volume:
-                fixed_requests_constrains[request_id].append(truck_id)
-    return fixed_requests_constrains
+def apply_requirements(requests: Entities, trucks: Entities, with_missed: bool) -> list[list[int]]:
+    # Списки разрешенных машин для потребителей, которым нужен старый формат
+    allowed_matrix = build_allowed_matrix(requests, trucks)
+    return [
+        np.flatnonzero(row).tolist() + ([-1] if with_missed else [])
+        for row in allowed_matrix
+    ]
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, ConfigDict
 
 from src.simulator.units.point import RoutePoint
+from src.simulator.utils.routes_loader import LazyGeometry
 
 
 class Geometry(BaseModel):
@@ -26,6 +27,14 @@ class Properties(BaseModel):
 
 
 class Route(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     type: str
-    geometry: Geometry
+    # Из потокового загрузчика приходит LazyGeometry - полилиния разбирается только по запросу
+    geometry: Geometry | LazyGeometry
     properties: Properties
+
+    def get_geometry(self) -> Geometry:
+        if isinstance(self.geometry, LazyGeometry):
+            return Geometry(**self.geometry.load())
+        return self.geometry
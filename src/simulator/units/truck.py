@@ -8,6 +8,7 @@ class Position(BaseModel):
 
     def set_current_point(self, point: Point):
         self.current_point.name = point.name
+        self.current_point.id = point.id
 
 class CargoParams(BaseModel):
     model_config = ConfigDict(frozen=True)
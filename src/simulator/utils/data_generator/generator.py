@@ -6,6 +6,10 @@ import os
 
 import numpy as np
 
+from src.simulator.managers.route_network import RouteNetwork
+from src.simulator.utils.hashing import hash_file
+from src.simulator.utils.routes_loader import json_default, load_routes
+
 
 class InputDataGenerator:
 
@@ -39,6 +43,24 @@ class InputDataGenerator:
         self._rng = np.random.default_rng(seed)
         self._routes_file_path = routes_file_path
         self._routes_data = self._load_or_create_routes()
+        # Тот же хеш, что сохраняется в метаданных обучения, - ключ кэша кратчайших путей
+        self._routes_sha256 = hash_file(self._routes_file_path)
+        self._route_network: RouteNetwork | None = None
+
+    @property
+    def routes_file_path(self) -> str:
+        return self._routes_file_path
+
+    @property
+    def routes_sha256(self) -> str:
+        return self._routes_sha256
+
+    @property
+    def route_network(self) -> RouteNetwork:
+        # Разобранная сеть из бинарного кэша рядом с файлом маршрутов (memory-map)
+        if self._route_network is None:
+            self._route_network = RouteNetwork.load_or_build(self._routes_file_path, self._routes_sha256)
+        return self._route_network
 
     def reseed(self, seed: int | None) -> None:
         self._rng = np.random.default_rng(seed)
@@ -48,8 +70,8 @@ class InputDataGenerator:
 
     def _load_or_create_routes(self) -> list[dict]:
         if os.path.exists(self._routes_file_path):
-            with open(self._routes_file_path, 'r') as f:
-                return json.load(f)
+            # geometry не разбирается, а подгружается из файла по запросу
+            return load_routes(self._routes_file_path)
 
         routes_data = self._generate_logical_routes()
         routes_dir = os.path.dirname(self._routes_file_path)
@@ -244,6 +266,6 @@ class InputDataGenerator:
 
         if dir_path is not None:
             with open(os.path.join(dir_path, 'routes.json'), 'w') as f:
-                json.dump(routes_data, f, default=str)
+                json.dump(routes_data, f, default=json_default)
         
         return generated_file, routes_data
@@ -0,0 +1,13 @@
+import hashlib
+from pathlib import Path
+
+
+def hash_file(file_path: Path | str) -> str:
+    digest = hashlib.sha256()
+    with Path(file_path).open("rb") as f:
+        while True:
+            chunk = f.read(8192)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,137 @@
+import json
+import mmap
+import re
+from pathlib import Path
+
+
+_WHITESPACE = re.compile(rb"\s*")
+_STRING = re.compile(rb'"(?:[^"\\]|\\.)*"')
+_SCALAR = re.compile(rb"[^,\]}\s]+")
+# Массив чисел и массив массивов чисел (координаты) пропускаются одним вызовом regex
+_NUMBER_ARRAY = re.compile(rb'\[[^\[\]{}"]*\]')
+_NUMBER_ARRAYS = re.compile(rb'\[\s*(?:\[[^\[\]{}"]*\]\s*(?:,\s*)?)*\]')
+
+
+class LazyGeometry:
+    """ Ссылка на geometry маршрута в файле (смещения в байтах), загружается только по запросу """
+
+    def __init__(self, file_path: Path | str, start: int, end: int):
+        self.file_path = Path(file_path)
+        self.start = start
+        self.end = end
+
+    def load(self) -> dict:
+        with self.file_path.open("rb") as f:
+            f.seek(self.start)
+            return json.loads(f.read(self.end - self.start))
+
+    def __eq__(self, other) -> bool:
+        # Сравнение с разобранной geometry (dict) - по содержимому
+        if isinstance(other, LazyGeometry):
+            return (self.file_path, self.start, self.end) == (other.file_path, other.start, other.end)
+        if isinstance(other, dict):
+            return self.load() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __deepcopy__(self, memo) -> "LazyGeometry":
+        # Ссылка неизменяемая, копировать нечего
+        return self
+
+    def __repr__(self) -> str:
+        return f"LazyGeometry({str(self.file_path)!r}, {self.start}, {self.end})"
+
+
+def json_default(value):
+    """ default для json.dump данных маршрутов: ленивая geometry выгружается целиком """
+    if isinstance(value, LazyGeometry):
+        return value.load()
+    return str(value)
+
+
+def _skip_whitespace(data, pos: int) -> int:
+    return _WHITESPACE.match(data, pos).end()
+
+
+def _expect(data, pos: int, char: bytes) -> int:
+    if data[pos:pos + 1] != char:
+        raise ValueError(f"Ожидался {char!r} на позиции {pos} в файле маршрутов")
+    return pos + 1
+
+
+def _skip_value(data, pos: int) -> int:
+    """ Возвращает позицию сразу после JSON-значения, которое начинается в pos """
+    char = data[pos:pos + 1]
+    if char == b'"':
+        return _STRING.match(data, pos).end()
+    if char == b"[":
+        match = _NUMBER_ARRAYS.match(data, pos) or _NUMBER_ARRAY.match(data, pos)
+        if match is not None:
+            return match.end()
+        return _skip_container(data, pos, b"]", with_keys=False)
+    if char == b"{":
+        return _skip_container(data, pos, b"}", with_keys=True)
+    match = _SCALAR.match(data, pos)
+    if match is None:
+        raise ValueError(f"Некорректное значение на позиции {pos} в файле маршрутов")
+    return match.end()
+
+
+def _skip_container(data, pos: int, closing_char: bytes, with_keys: bool) -> int:
+    pos = _skip_whitespace(data, pos + 1)
+    if data[pos:pos + 1] == closing_char:
+        return pos + 1
+    while True:
+        if with_keys:
+            pos = _skip_whitespace(data, _STRING.match(data, pos).end())
+            pos = _skip_whitespace(data, _expect(data, pos, b":"))
+        pos = _skip_whitespace(data, _skip_value(data, pos))
+        if data[pos:pos + 1] == closing_char:
+            return pos + 1
+        pos = _skip_whitespace(data, _expect(data, pos, b","))
+
+
+def _parse_route(data, pos: int, file_path: Path) -> tuple[dict, int]:
+    route_data = {}
+    pos = _skip_whitespace(data, _expect(data, pos, b"{"))
+    if data[pos:pos + 1] == b"}":
+        return route_data, pos + 1
+    while True:
+        key_end = _STRING.match(data, pos).end()
+        key = json.loads(data[pos:key_end])
+        pos = _skip_whitespace(data, _expect(data, _skip_whitespace(data, key_end), b":"))
+        value_end = _skip_value(data, pos)
+        if key == "geometry":
+            route_data[key] = LazyGeometry(file_path, pos, value_end)
+        else:
+            # properties (расстояние и конечные точки) и type маленькие - разбираем сразу
+            route_data[key] = json.loads(data[pos:value_end])
+        pos = _skip_whitespace(data, value_end)
+        if data[pos:pos + 1] == b"}":
+            return route_data, pos + 1
+        pos = _skip_whitespace(data, _expect(data, pos, b","))
+
+
+def load_routes(file_path: Path | str) -> list[dict]:
+    """ Потоковая загрузка routes.json за один проход
+
+    Файл отображается в память, geometry маршрутов не разбирается, а заменяется на LazyGeometry,
+    поэтому память и время загрузки не растут с длиной полилиний.
+    """
+    file_path = Path(file_path)
+    routes_data = []
+    with file_path.open("rb") as f:
+        if f.seek(0, 2) == 0:
+            raise ValueError(f"Пустой файл маршрутов {file_path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            pos = _skip_whitespace(data, _expect(data, _skip_whitespace(data, 0), b"["))
+            if data[pos:pos + 1] == b"]":
+                return routes_data
+            while True:
+                route_data, pos = _parse_route(data, pos, file_path)
+                routes_data.append(route_data)
+                pos = _skip_whitespace(data, pos)
+                if data[pos:pos + 1] == b"]":
+                    return routes_data
+                pos = _skip_whitespace(data, _expect(data, pos, b","))
@@ -1,7 +1,12 @@
 import datetime
+import re
 from typing import Union
 import datetime as dt
 
+import numpy as np
+
+# Строка ровно в формате "%Y-%m-%d %H:%M:%S" с ведущими нулями (такие разбираются через datetime64)
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
 
 class Time:
     def __init__(self, date_start: str, date_end: str):
@@ -52,33 +57,44 @@ class Time:
             days=period // self._periods_per_day,
         )
 
-    def __replace_date(self, tag: Union[int, float, str, list, dict]) -> None:
-        if isinstance(tag, dict):
-            for key, value in tag.copy().items():
-                if self.__check_datetime_str(key, self._date_format):
-                    del tag[key]
-                    new_key = self.__datetime2period(key)
-                    tag[new_key] = value
-                else:
-                    pass
-                if self.__check_datetime_str(value, self._date_format):
-                    new_value = self.__datetime2period(value)
-                    tag[key] = new_value
-                else:
-                    self.__replace_date(value)
-        elif isinstance(tag, list):
-            for value in tag.copy():
-                if self.__check_datetime_str(value, self._date_format):
-                    tag.remove(value)
-                    new_value = self.__datetime2period(value)
-                    tag.append(new_value)
-                else:
-                    self.__replace_date(value)
-        else:
+    def __datetimes2periods(self, values: list[str]) -> np.ndarray:
+        # Разбираем все даты разом в datetime64 и считаем целые часы от начала (с отбрасыванием дробной части)
+        seconds = (
+            np.array(values, dtype="datetime64[s]") - np.datetime64(self._date_start, "s")
+        ).astype(np.int64)
+        hours = np.where(seconds >= 0, seconds // 3600, -(-seconds // 3600))
+        return np.rint(hours * self._periods_per_day / 24).astype(np.int64)
+
+    def __replace_dates(self, tags: list[dict], keys: tuple[str, ...]) -> None:
+        # Места, где в словарях лежат строки с датами
+        places = [(tag, key) for tag in tags for key in keys if isinstance(tag.get(key), str)]
+        if not places:
             return
+        # datetime64 принимает любой ISO-8601, поэтому через него идут только строки ровно в нашем формате
+        vector_places = [(tag, key) for tag, key in places if DATE_PATTERN.fullmatch(tag[key])]
+        try:
+            periods = self.__datetimes2periods([tag[key] for tag, key in vector_places])
+        except ValueError:
+            # Есть несуществующие даты (например, 13-й месяц) - разбираем все по одной
+            vector_places, periods = [], np.empty(0, dtype=np.int64)
+        for (tag, key), period in zip(vector_places, periods.tolist()):
+            tag[key] = period
+
+        # Остальное проверяем strptime, как раньше: строки не в формате даты остаются без изменений
+        for tag, key in places:
+            if isinstance(tag[key], str) and self.__check_datetime_str(tag[key], self._date_format):
+                tag[key] = self.__datetime2period(tag[key])
 
     def transition_to_periods(self, input_data: dict) -> dict:
-        self.__replace_date(input_data)
+        """ Переводит даты входных данных в периоды
+
+        Даты есть только в границах симуляции и во временных окнах точек погрузки,
+        поэтому обходятся только эти поля, а разбор идет одним вызовом numpy.
+        """
+        if "time" in input_data:
+            self.__replace_dates([input_data["time"]], ("simulator_start_date", "simulator_end_date"))
+        load_points = [request_data["point_to_load"] for request_data in input_data.get("requests", [])]
+        self.__replace_dates(load_points, ("date_start_window", "date_end_window"))
         return input_data
 
     @property
@@ -0,0 +1,342 @@
+import copy
+import json
+import re
+
+import numpy as np
+import pytest
+
+import src.simulator.managers.route_network as route_network_module
+import src.simulator.managers.shortest_paths as shortest_paths_module
+from src.simulator.builder import get_env, get_requests_constraints
+from src.simulator.environment import Environment
+from src.simulator.managers.route_network import ROUTES_CACHE_DIR_NAME, RouteNetwork
+from src.simulator.managers.shortest_paths import ShortestPathCache, all_pairs_shortest_paths, complete_distance_matrix
+from src.simulator.model.simulator import Simulator
+from src.simulator.units.requirement import (
+    get_requirements,
+    register_requirement,
+    trucks_capacity_requirement,
+    unregister_requirement,
+)
+from src.simulator.utils.hashing import hash_file
+from src.simulator.utils.routes_loader import json_default
+
+
+def test_compiled_environment_is_built_once(environment: Environment):
+    assert environment.compiled is environment.compiled
+
+
+def test_compiled_environment_matches_route_manager(environment: Environment):
+    compiled_env = environment.compiled
+
+    assert compiled_env.trucks_num == len(environment.trucks)
+    assert compiled_env.requests_num == environment.requests_num
+    for request_id, request in enumerate(environment.requests):
+        assert compiled_env.point_names[compiled_env.request_load_points[request_id]] == request.point_to_load.name
+        assert compiled_env.request_window_starts[request_id] == request.point_to_load.date_start_window
+        assert compiled_env.request_volumes[request_id] == request.volume
+
+        for truck in environment.trucks:
+            expected_travel_time = environment.route_manager.calculate_travel_time_to_point(
+                truck=truck,
+                with_cargo=False,
+                request=request,
+                departure_point=truck.position.current_point,
+                destination_point=request.point_to_load,
+            )
+            travel_time = compiled_env.get_travel_times(
+                truck_ids=np.array([truck.id]),
+                request_id=request_id,
+                departure_points=compiled_env.truck_start_points[[truck.id]],
+                destination_point=compiled_env.request_load_points[request_id],
+                with_cargo=False,
+            )
+            assert travel_time[0] == expected_travel_time
+
+
+def test_travel_time_table_uses_fix_route_override(input_generator):
+    input_data, routes_data = input_generator.generate_all(None)
+    fix_route = routes_data[0]["properties"]
+    fix_route_name = f"{fix_route['points'][0]['name']}_{fix_route['points'][1]['name']}"
+    for request_data in input_data["requests"]:
+        request_data["fix_route"] = fix_route_name
+    environment = get_env(input_data, routes_data)
+    compiled_env = environment.compiled
+
+    for request_id, request in enumerate(environment.requests):
+        assert compiled_env.request_has_fix_route[request_id]
+        for truck in environment.trucks:
+            for with_cargo in (False, True):
+                expected_travel_time = environment.route_manager.calculate_travel_time_to_point(
+                    truck=truck,
+                    with_cargo=with_cargo,
+                    request=request,
+                    departure_point=request.point_to_load,
+                    destination_point=request.point_to_unload,
+                )
+                travel_time = compiled_env.get_travel_times(
+                    truck_ids=truck.id,
+                    request_id=request_id,
+                    departure_points=compiled_env.request_load_points[request_id],
+                    destination_point=compiled_env.request_unload_points[request_id],
+                    with_cargo=with_cargo,
+                )
+                assert travel_time == expected_travel_time
+
+
+def test_constraint_index_is_cached_and_matches_capacity(environment: Environment):
+    assert get_requests_constraints(environment, True) is get_requests_constraints(environment, True)
+
+    constraint_index = environment.constraints
+    for request_id, request in enumerate(environment.requests):
+        for truck in environment.trucks:
+            expected_allowed = truck.cargo_params.capacity >= request.volume
+            assert constraint_index.allowed_matrix[request_id, truck.id] == expected_allowed
+            assert (truck.id in get_requests_constraints(environment, False)[request_id]) == expected_allowed
+        assert get_requests_constraints(environment, True)[request_id][-1] == -1
+        assert constraint_index.is_allowed(request_id, -1)
+
+
+def test_point_ids_are_interned_in_get_env(environment: Environment, simulator):
+    point_table = environment.point_table
+    assert point_table is environment.route_manager.point_table
+    assert environment.compiled.point_names == point_table.names
+
+    for truck in environment.trucks:
+        assert truck.position.current_point.id == point_table.get_id(truck.position.current_point.name)
+    for request in environment.requests:
+        assert request.point_to_load.id == point_table.get_id(request.point_to_load.name)
+        assert request.point_to_unload.id == point_table.get_id(request.point_to_unload.name)
+        assert environment.route_manager.distances[request.point_to_load.id, request.point_to_load.id] == 0
+
+    _, truck_positions, _ = simulator.run(tuple([-1] * environment.requests_num))
+    assert [point.id for point in truck_positions] == environment.compiled.truck_start_points.tolist()
+    assert [point.name for point in truck_positions] == [
+        point_table.get_name(point.id) for point in truck_positions
+    ]
+
+
+def test_all_pairs_shortest_paths_keeps_direct_routes():
+    distances = np.array([
+        [0.0, 1.0, np.inf, 10.0],
+        [1.0, 0.0, 2.0, np.inf],
+        [np.inf, 2.0, 0.0, 3.0],
+        [10.0, np.inf, 3.0, 0.0],
+    ])
+
+    np.testing.assert_array_equal(all_pairs_shortest_paths(distances)[0], [0.0, 1.0, 3.0, 6.0])
+    completed = complete_distance_matrix(distances)
+    np.testing.assert_array_equal(completed[0], [0.0, 1.0, 3.0, 10.0])
+    assert completed[1, 3] == completed[3, 1] == 5.0
+
+
+def test_unreachable_points_raise_descriptive_error(environment, monkeypatch):
+    route_manager = environment.route_manager
+    request = next(request for request in environment.requests if not request.has_fix_route())
+    load_point, unload_point = request.point_to_load, request.point_to_unload
+    distances = route_manager.distances.copy()
+    distances[unload_point.id, load_point.id] = np.inf
+    monkeypatch.setattr(route_manager, "_distances", distances)
+
+    with pytest.raises(KeyError, match=f"{re.escape(load_point.name)}.*{re.escape(unload_point.name)}"):
+        route_manager.calculate_travel_time_to_point(environment.trucks[0], True, request, load_point, unload_point)
+
+
+def test_instance_point_without_routes_raises(input_generator):
+    input_data, routes_data = input_generator.generate_all(None)
+    input_data["trucks"][0]["position"]["current_point"]["name"] = "Point_without_routes"
+
+    with pytest.raises(KeyError, match="Point_without_routes"):
+        get_env(input_data, routes_data)
+
+
+def test_sparse_routes_are_completed_and_cached(input_generator, tmp_path, monkeypatch):
+    input_data, routes_data = input_generator.generate_all(None)
+    removed_route = routes_data.pop(0)
+    load_point_name, unload_point_name = [point["name"] for point in removed_route["properties"]["points"]]
+
+    monkeypatch.setattr(route_network_module, "SHORTEST_PATH_CACHE", ShortestPathCache())
+    environment = get_env(copy.deepcopy(input_data), copy.deepcopy(routes_data), routes_sha256="routes-hash")
+    point_table = environment.point_table
+    distances = environment.route_manager.distances
+    load_point_id, unload_point_id = point_table.get_id(load_point_name), point_table.get_id(unload_point_name)
+
+    expected_distance = np.min(distances[load_point_id] + distances[:, unload_point_id])
+    assert np.isfinite(expected_distance)
+    assert distances[load_point_id, unload_point_id] == expected_distance
+    assert get_env(
+        copy.deepcopy(input_data), copy.deepcopy(routes_data), routes_sha256="routes-hash"
+    ).route_manager.distances is distances
+
+    # Дополненная матрица сохраняется в бинарный кэш сети и в новом процессе не считается заново
+    routes_file_path = tmp_path / "routes.json"
+    routes_file_path.write_text(json.dumps(routes_data, default=json_default))
+    built_network = RouteNetwork.load_or_build(routes_file_path)
+
+    def forbidden_complete_distance_matrix(*args, **kwargs):
+        raise AssertionError("Матрица должна браться из кэша")
+
+    monkeypatch.setattr(shortest_paths_module, "complete_distance_matrix", forbidden_complete_distance_matrix)
+    monkeypatch.setattr(route_network_module, "SHORTEST_PATH_CACHE", ShortestPathCache())
+    cached_network = RouteNetwork.load_or_build(routes_file_path)
+    np.testing.assert_array_equal(cached_network.distances, built_network.distances)
+    np.testing.assert_array_equal(cached_network.distances, distances)
+
+
+def test_route_network_binary_cache_is_memory_mapped(input_generator, tmp_path):
+    input_data, routes_data = input_generator.generate_all(None)
+    routes_file_path = tmp_path / "routes.json"
+    routes_file_path.write_text(json.dumps(routes_data, default=json_default))
+
+    built_network = RouteNetwork.load_or_build(routes_file_path)
+    cache_dirs = list((tmp_path / ROUTES_CACHE_DIR_NAME).iterdir())
+    assert [cache_dir.name for cache_dir in cache_dirs] == [hash_file(routes_file_path)]
+
+    cached_network = RouteNetwork.load_or_build(routes_file_path)
+    assert isinstance(cached_network.distances, np.memmap)
+    assert cached_network.point_names == built_network.point_names
+    np.testing.assert_array_equal(cached_network.distances, built_network.distances)
+
+    environment = get_env(copy.deepcopy(input_data), copy.deepcopy(routes_data))
+    cached_environment = get_env(copy.deepcopy(input_data), cached_network)
+    np.testing.assert_array_equal(cached_environment.compiled.travel_times, environment.compiled.travel_times)
+    assert cached_environment.compiled.point_names == environment.compiled.point_names
+
+    request = cached_environment.requests[0]
+    route = cached_environment.route_manager.find_route(request, request.point_to_load, request.point_to_unload)
+    expected_route = environment.route_manager.find_route(request, request.point_to_load, request.point_to_unload)
+    assert route.properties.name == expected_route.properties.name
+    assert route.properties.distance == expected_route.properties.distance
+    assert route.get_geometry() == expected_route.get_geometry()
+
+
+def test_get_env_with_routes_file_uses_binary_cache(input_generator, tmp_path):
+    input_data, routes_data = input_generator.generate_all(None)
+    routes_file_path = tmp_path / "routes.json"
+    routes_file_path.write_text(json.dumps(routes_data, default=json_default))
+    routes_sha256 = hash_file(routes_file_path)
+
+    environment = get_env(copy.deepcopy(input_data), str(routes_file_path), routes_sha256)
+    assert (tmp_path / ROUTES_CACHE_DIR_NAME / routes_sha256).is_dir()
+    cached_environment = get_env(copy.deepcopy(input_data), routes_file_path)
+    assert isinstance(cached_environment.route_manager.network.distances, np.memmap)
+
+    expected_environment = get_env(copy.deepcopy(input_data), copy.deepcopy(routes_data))
+    for env in (environment, cached_environment):
+        assert env.compiled.point_names == expected_environment.compiled.point_names
+        np.testing.assert_array_equal(env.compiled.travel_times, expected_environment.compiled.travel_times)
+
+
+def test_entities_iteration_is_reentrant_and_columns_are_cached(environment: Environment):
+    trucks = environment.trucks
+    pairs = [(truck.id, other_truck.id) for truck in trucks for other_truck in trucks]
+    assert pairs == [(i, j) for i in range(len(trucks)) for j in range(len(trucks))]
+    assert trucks[np.int64(0)] is trucks[0] is trucks[trucks[0].info.name]
+
+    window_starts = environment.requests.get_column("point_to_load.date_start_window")
+    assert window_starts is environment.requests.get_column("point_to_load.date_start_window")
+    assert not window_starts.flags.writeable
+    assert window_starts.tolist() == [request.point_to_load.date_start_window for request in environment.requests]
+
+
+def test_registered_requirement_is_combined_with_capacity(input_generator):
+    def forbid_first_truck(requests, trucks):
+        allowed = np.ones((len(requests), len(trucks)), dtype=bool)
+        allowed[:, 0] = False
+        return allowed
+
+    register_requirement(forbid_first_truck)
+    try:
+        input_data, routes_data = input_generator.generate_all(None)
+        environment = get_env(input_data, routes_data)
+        allowed_matrix = environment.constraints.allowed_matrix
+    finally:
+        unregister_requirement(forbid_first_truck)
+
+    assert not allowed_matrix[:, 0].any()
+    np.testing.assert_array_equal(
+        allowed_matrix[:, 1:],
+        trucks_capacity_requirement(environment.requests, environment.trucks)[:, 1:]
+    )
+    assert forbid_first_truck not in get_requirements()
+
+
+def test_requests_travel_times_match_per_request_lookup(input_generator):
+    input_data, routes_data = input_generator.generate_all(None)
+    fix_route = routes_data[0]["properties"]
+    input_data["requests"][0]["fix_route"] = f"{fix_route['points'][0]['name']}_{fix_route['points'][1]['name']}"
+    compiled_env = get_env(input_data, routes_data).compiled
+    request_ids = np.arange(compiled_env.requests_num)
+
+    for with_cargo in (False, True):
+        travel_times = compiled_env.get_requests_travel_times(
+            request_ids=request_ids,
+            departure_points=compiled_env.truck_start_points[np.newaxis, :],
+            destination_points=compiled_env.request_load_points,
+            with_cargo=with_cargo,
+        )
+        assert travel_times.shape == (compiled_env.requests_num, compiled_env.trucks_num)
+        assert compiled_env.request_has_fix_route.any()
+        for request_id in request_ids:
+            np.testing.assert_array_equal(
+                travel_times[request_id],
+                compiled_env.get_travel_times(
+                    truck_ids=np.arange(compiled_env.trucks_num),
+                    request_id=request_id,
+                    departure_points=compiled_env.truck_start_points,
+                    destination_point=compiled_env.request_load_points[request_id],
+                    with_cargo=with_cargo,
+                )
+            )
+
+
+def test_travel_times_cover_only_instance_points(environment: Environment):
+    compiled_env = environment.compiled
+    instance_points = {truck.position.current_point.id for truck in environment.trucks}
+    for request in environment.requests:
+        instance_points.update((request.point_to_load.id, request.point_to_unload.id))
+    assert compiled_env.instance_point_ids.tolist() == sorted(instance_points)
+    assert compiled_env.travel_times.shape == (compiled_env.trucks_num, len(instance_points), len(instance_points), 2)
+
+    route_manager = environment.route_manager
+    for request_id, request in enumerate(environment.requests):
+        if request.has_fix_route():
+            continue
+        for truck_id, truck in enumerate(environment.trucks):
+            expected_travel_time = route_manager.calculate_travel_time_to_point(
+                truck, False, request, truck.position.current_point, request.point_to_load
+            )
+            assert compiled_env.get_travel_times(
+                truck_id, request_id, truck.position.current_point.id, request.point_to_load.id, with_cargo=False
+            ) == expected_travel_time
+
+
+def test_trusted_get_env_matches_validated(input_generator):
+    input_data, routes_data = input_generator.generate_all(None)
+    environment = get_env(copy.deepcopy(input_data), copy.deepcopy(routes_data))
+    trusted_environment = get_env(copy.deepcopy(input_data), copy.deepcopy(routes_data), trusted=True)
+
+    # Столбцы и массивы строятся прямо из данных, до обращения к моделям
+    assert len(trusted_environment.requests) == environment.requests_num
+    np.testing.assert_array_equal(
+        trusted_environment.requests.get_column("point_to_load.date_start_window"),
+        environment.requests.get_column("point_to_load.date_start_window"),
+    )
+    assert trusted_environment.compiled.point_names == environment.compiled.point_names
+    np.testing.assert_array_equal(trusted_environment.compiled.travel_times, environment.compiled.travel_times)
+    np.testing.assert_array_equal(
+        trusted_environment.compiled.request_fix_route_distances, environment.compiled.request_fix_route_distances
+    )
+    np.testing.assert_array_equal(
+        trusted_environment.constraints.allowed_matrix, environment.constraints.allowed_matrix
+    )
+
+    assert list(trusted_environment.trucks) == list(environment.trucks)
+    assert list(trusted_environment.requests) == list(environment.requests)
+    request = environment.requests[0]
+    assert trusted_environment.requests[request.info.name] == request
+
+    selection = tuple(
+        allowed_trucks[0] for allowed_trucks in get_requests_constraints(environment, with_missed=True)
+    )
+    assert Simulator(trusted_environment).run(selection) == Simulator(environment).run(selection)
@@ -1,6 +1,10 @@
 import json
+import random
 from pathlib import Path
 
+import numpy as np
+import pytest
+
 from src.gen_algo.compare_models import AlgorithmRunResult
 from src.gen_algo.compare_models import build_fixed_test_instances
 from src.gen_algo.compare_models import build_summary
@@ -11,6 +15,13 @@ from src.gen_algo.model_rl_mutator import GeneticAlgoWithRlMutator
 from src.gen_algo.model_rl_mutator import GeneticAlgoWithRlTailMutator
 from src.gen_algo.model_rl_mutator import GeneticAlgoWithInitAndRlMutator
 from src.gen_algo.model_rl_mutator import GeneticAlgoWithInitAndRlTailMutator
+from src.gen_algo.simple_model import GeneticAlgoSimple
+
+
+def _count_served_requests(simulator, individual) -> int:
+    # Эталонная приспособленность по полному прогону Simulator.run
+    missed_requests_ids, _, _ = simulator.run(tuple(individual))
+    return len(individual) - len(missed_requests_ids)
 
 
 def test_gen_algo_from_model_path_loads_observation_config(
@@ -213,7 +224,7 @@ def test_build_fixed_test_instances_is_deterministic() -> None:
 
 
 def test_run_single_algorithm_returns_metrics(monkeypatch, input_generator) -> None:
-    input_data, routes_data = input_generator.generate_all(None)
+    input_data, _ = input_generator.generate_all(None)
 
     class DummyGA:
         def fit(self, iterations: int):
@@ -228,7 +239,8 @@ def test_run_single_algorithm_returns_metrics(monkeypatch, input_generator) -> N
         algorithm="ga",
         instance_id=0,
         input_data=input_data,
-        routes_data=routes_data,
+        routes_file_path=input_generator.routes_file_path,
+        routes_sha256=input_generator.routes_sha256,
         model_path=Path("output/models/2026-04-24_13-12-29.zip"),
         ga_iterations=3,
         population_size=10,
@@ -302,3 +314,84 @@ def test_build_summary_includes_rl_mutator_variant() -> None:
         "ga_with_rl_init_and_mutator",
         "ga_with_rl_init_and_tail_mutator",
     ]
+
+
+def test_run_batch_matches_simulator_run(simulator, requests_constraints) -> None:
+    rng = random.Random(1)
+    population = [
+        [rng.choice(req_constr) for req_constr in requests_constraints]
+        for _ in range(30)
+    ]
+
+    missed_requests_nums = simulator.run_batch(np.array(population))
+
+    assert missed_requests_nums.tolist() == [
+        len(simulator.run(tuple(individual))[0]) for individual in population
+    ]
+
+
+def test_simple_gen_algo_evaluates_population_in_batch(simulator, requests_constraints) -> None:
+    random.seed(2)
+    ga = GeneticAlgoSimple(
+        simulator=simulator,
+        requests_constrains=requests_constraints,
+        popul_size=10,
+    )
+    population = ga._create_initial_population()
+
+    assert ga._evaluate_population(population) == [_count_served_requests(simulator, ind) for ind in population]
+
+
+@pytest.mark.parametrize("checkpoint_stride", [1, 3])
+def test_run_batch_resumes_children_from_parent_checkpoints(simulator, requests_constraints, checkpoint_stride) -> None:
+    rng = random.Random(3)
+    parents = np.array([
+        [rng.choice(req_constr) for req_constr in requests_constraints]
+        for _ in range(10)
+    ])
+    _, parent_checkpoints = simulator.run_batch_with_checkpoints(parents, checkpoint_stride=checkpoint_stride)
+
+    children, parent_ids = [], []
+    for _ in range(20):
+        parent_id, donor_id = rng.randrange(len(parents)), rng.randrange(len(parents))
+        point = rng.randint(1, len(requests_constraints) - 1)
+        children.append(np.concatenate([parents[parent_id][:point], parents[donor_id][point:]]))
+        parent_ids.append(parent_id)
+    children.append(parents[0].copy())
+    parent_ids.append(0)
+    children.append(parents[1].copy())
+    parent_ids.append(-1)
+    children = np.array(children)
+
+    missed_requests_nums, checkpoints = simulator.run_batch_with_checkpoints(
+        children, parent_checkpoints=parent_checkpoints, parent_ids=np.array(parent_ids)
+    )
+    _, expected_checkpoints = simulator.run_batch_with_checkpoints(children, checkpoint_stride=checkpoint_stride)
+
+    assert missed_requests_nums.tolist() == simulator.run_batch(children).tolist()
+    np.testing.assert_array_equal(checkpoints.truck_points, expected_checkpoints.truck_points)
+    np.testing.assert_array_equal(checkpoints.truck_times, expected_checkpoints.truck_times)
+    np.testing.assert_array_equal(checkpoints.missed_counts, expected_checkpoints.missed_counts)
+
+
+def test_simple_gen_algo_fit_evaluates_children_from_checkpoints(simulator, requests_constraints, monkeypatch) -> None:
+    random.seed(4)
+    ga = GeneticAlgoSimple(
+        simulator=simulator,
+        requests_constrains=requests_constraints,
+        popul_size=12,
+        checkpoint_stride=2,
+    )
+    evaluate_population = ga._evaluate_population
+    resumed_generations = []
+
+    def checked_evaluate_population(population):
+        resumed_generations.append(ga._prefix_parents is not None)
+        fitnesses = evaluate_population(population)
+        assert fitnesses == [_count_served_requests(simulator, ind) for ind in population]
+        return fitnesses
+
+    monkeypatch.setattr(ga, "_evaluate_population", checked_evaluate_population)
+    ga.fit(3)
+    # Все поколения, кроме начального, продолжают чекпоинты родителей
+    assert resumed_generations == [False, True, True, True]
@@ -1,8 +1,13 @@
 import json
 from datetime import datetime
 
+import pytest
+
 from src.optimizer.settings import GENERATOR_SETTINGS
+from src.simulator.units.route import Route
 from src.simulator.utils.data_generator.generator import InputDataGenerator
+from src.simulator.utils.routes_loader import LazyGeometry, load_routes
+from src.simulator.utils.time import Time
 
 
 def _build_generator(routes_file_path: str, seed: int | None) -> InputDataGenerator:
@@ -62,3 +67,70 @@ def test_generator_uses_existing_routes_file_without_recreating_it(tmp_path) ->
     with routes_file_path.open("r") as f:
         saved_routes = json.load(f)
     assert saved_routes == existing_routes
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_load_routes_matches_json_and_loads_geometry_lazily(tmp_path, indent) -> None:
+    routes_file_path = tmp_path / "routes.json"
+    generator = _build_generator(str(routes_file_path), seed=42)
+    routes = generator.generate_routes()
+    routes[0]["geometry"]["coordinates"] = [[float(i), -i * 1.5e-3] for i in range(5000)]
+    routes[1]["properties"]["points"][0]["name"] = 'Load "quoted" ]}'
+    routes_file_path.write_text(json.dumps(routes, indent=indent))
+
+    loaded_routes = load_routes(routes_file_path)
+
+    assert all(isinstance(route["geometry"], LazyGeometry) for route in loaded_routes)
+    assert [route["properties"] for route in loaded_routes] == [route["properties"] for route in routes]
+    assert loaded_routes == routes
+    assert Route(**loaded_routes[0]).get_geometry().coordinates == routes[0]["geometry"]["coordinates"]
+
+
+def test_time_converts_only_schema_dates_to_periods(tmp_path) -> None:
+    generator = _build_generator(str(tmp_path / "routes.json"), seed=7)
+    input_data, _ = generator.generate_all(None)
+    input_data["requests"][0]["info"]["name"] = "2025-01-01 00:00:00"
+    input_data["requests"][0]["point_to_load"]["date_start_window"] = "2024-12-31 22:30:00"
+    expected_windows = [
+        (request["point_to_load"]["date_start_window"], request["point_to_load"]["date_end_window"])
+        for request in input_data["requests"]
+    ]
+    start_date = datetime.strptime(input_data["time"]["simulator_start_date"], "%Y-%m-%d %H:%M:%S")
+
+    def to_period(date: str) -> int:
+        return int((datetime.strptime(date, "%Y-%m-%d %H:%M:%S") - start_date).total_seconds() / 60 / 60)
+
+    time = Time(input_data["time"]["simulator_start_date"], input_data["time"]["simulator_end_date"])
+    time.transition_to_periods(input_data)
+
+    assert input_data["time"]["simulator_start_date"] == 0
+    assert input_data["time"]["simulator_end_date"] == time.end_period
+    assert input_data["requests"][0]["info"]["name"] == "2025-01-01 00:00:00"
+    assert input_data["requests"][0]["point_to_load"]["date_start_window"] == -1
+    assert [
+        (request["point_to_load"]["date_start_window"], request["point_to_load"]["date_end_window"])
+        for request in input_data["requests"]
+    ] == [(to_period(window_start), to_period(window_end)) for window_start, window_end in expected_windows]
+
+
+def test_time_keeps_strings_not_in_date_format(tmp_path) -> None:
+    generator = _build_generator(str(tmp_path / "routes.json"), seed=7)
+    input_data, _ = generator.generate_all(None)
+    point_to_load = input_data["requests"][0]["point_to_load"]
+    point_to_load["date_start_window"] = "2025-01-01T05:00"
+    point_to_load["date_end_window"] = "2025-13-01 05:00:00"
+    other_point_to_load = input_data["requests"][1]["point_to_load"]
+    other_point_to_load["date_start_window"] = "2025-01-01"
+    other_point_to_load["date_end_window"] = "2025-1-1 5:0:0"
+    start_date = datetime.strptime(input_data["time"]["simulator_start_date"], "%Y-%m-%d %H:%M:%S")
+    expected_end_window = int((datetime(2025, 1, 1, 5) - start_date).total_seconds() / 60 / 60)
+
+    time = Time(input_data["time"]["simulator_start_date"], input_data["time"]["simulator_end_date"])
+    time.transition_to_periods(input_data)
+
+    # Как и strptime с форматом входных данных: ISO-8601 и несуществующие даты не разбираются
+    assert point_to_load["date_start_window"] == "2025-01-01T05:00"
+    assert point_to_load["date_end_window"] == "2025-13-01 05:00:00"
+    assert other_point_to_load["date_start_window"] == "2025-01-01"
+    assert other_point_to_load["date_end_window"] == expected_end_window
+    assert isinstance(input_data["requests"][2]["point_to_load"]["date_start_window"], int)
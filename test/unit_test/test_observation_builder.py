@@ -1,7 +1,9 @@
 import numpy as np
 
 from src.optimizer.settings import GENERATOR_SETTINGS, DEFAULT_OBSERVATION_FEATURES
+from src.optimizer.utils.feature_timing import FeatureTimings
 from src.optimizer.utils.observation_builder import ObservationBuilder
+from src.simulator.model.simulator import Simulator
 from src.simulator.units.point import Point
 
 
@@ -221,3 +223,106 @@ def test_pairwise_lookahead_uses_real_future_request_values(environment, request
         )
 
         assert observation["travel_time_to_load"][lookahead_offset][allowed_truck_id] != np.float32(1.0)
+
+
+def test_action_masks_are_precomputed_row_views(obs_builder, environment, requests_constraints):
+    for request_id, allowed_trucks in enumerate(requests_constraints):
+        action_mask = obs_builder.create_action_mask(request_id)
+        assert action_mask.shape == (GENERATOR_SETTINGS.max_truck_num + 1,)
+        assert set(np.flatnonzero(action_mask) - 1) == set(allowed_trucks)
+        assert np.shares_memory(action_mask, obs_builder.create_action_mask(request_id))
+
+
+def test_observation_views_reuse_buffers_and_copies_do_not(environment, requests_constraints):
+    view_builder = ObservationBuilder(environment, requests_constraints, return_views=True)
+    copy_builder = ObservationBuilder(environment, requests_constraints)
+
+    first_view = view_builder.create_observation([], [])
+    first_view_values = {key: value.copy() for key, value in first_view.items()}
+    first_copy = copy_builder.create_observation([], [])
+    for key in first_copy:
+        np.testing.assert_array_equal(first_view[key], first_copy[key])
+
+    current_selection = [requests_constraints[0][0]]
+    second_view = view_builder.create_observation([], current_selection)
+    second_copy = copy_builder.create_observation([], current_selection)
+    for key in second_view:
+        assert second_view[key] is first_view[key]
+        assert not np.shares_memory(second_copy[key], first_copy[key])
+        np.testing.assert_array_equal(first_copy[key], first_view_values[key])
+    assert second_view["current_selection"][0] == current_selection[0]
+
+
+def test_observation_session_matches_full_rebuild(environment, requests_constraints):
+    feature_config = DEFAULT_OBSERVATION_FEATURES.model_copy(update={"pairwise_lookahead_requests": 3})
+    builder = ObservationBuilder(environment, requests_constraints, feature_config, return_views=True)
+    session = builder.start_session()
+    simulation_session = Simulator(environment).start_session()
+
+    def assert_same_observation(incremental_observation, current_selection, simulation_result):
+        expected_observation = builder.create_observation(
+            simulation_result[0], current_selection, simulation_result[1], simulation_result[2]
+        )
+        assert incremental_observation.keys() == expected_observation.keys()
+        for key in expected_observation:
+            np.testing.assert_array_equal(incremental_observation[key], expected_observation[key])
+
+    observation = session.reset()
+    assert_same_observation(observation, [], ([], None, None))
+
+    current_selection = []
+    for request_id, allowed_trucks in enumerate(requests_constraints):
+        # Чередуем отказы и назначения, чтобы в выборке были пропущенные заявки
+        truck_id = -1 if request_id % 3 == 0 else allowed_trucks[0]
+        current_selection.append(truck_id)
+        simulation_result = simulation_session.append(truck_id)
+        observation = session.append(truck_id, *simulation_result)
+        assert_same_observation(observation, current_selection, simulation_result)
+    assert session.selection_len == environment.requests_num
+
+
+def test_lookahead_rows_match_single_request_observations(environment, requests_constraints, simulator):
+    lookahead = 4
+    lookahead_builder = ObservationBuilder(
+        environment,
+        requests_constraints,
+        DEFAULT_OBSERVATION_FEATURES.model_copy(update={"pairwise_lookahead_requests": lookahead}),
+    )
+    single_builder = ObservationBuilder(environment, requests_constraints)
+
+    current_selection = [allowed_trucks[0] for allowed_trucks in requests_constraints[:environment.requests_num - 2]]
+    missed_requests_ids, truck_positions, truck_available_times = simulator.run(tuple(current_selection))
+    observation = lookahead_builder.create_observation(
+        missed_requests_ids, current_selection, truck_positions, truck_available_times
+    )
+    for lookahead_offset in range(lookahead):
+        # Строка lookahead совпадает с наблюдением, в котором эта заявка - следующая (при том же состоянии машин)
+        shifted_selection = current_selection + [-1] * lookahead_offset
+        single_observation = single_builder.create_observation(
+            missed_requests_ids, shifted_selection, truck_positions, truck_available_times
+        )
+        for key in ObservationBuilder._PAIRWISE_KEYS:
+            np.testing.assert_array_equal(observation[key][lookahead_offset], single_observation[key][0])
+
+
+def test_feature_timings_do_not_change_observation(environment, requests_constraints, simulator):
+    timings = FeatureTimings()
+    timed_builder = ObservationBuilder(environment, requests_constraints, timings=timings)
+    builder = ObservationBuilder(environment, requests_constraints)
+
+    current_selection = [allowed_trucks[0] for allowed_trucks in requests_constraints]
+    simulation_result = simulator.run(tuple(current_selection))
+    timed_observation = timed_builder.create_observation(simulation_result[0], current_selection, *simulation_result[1:])
+    observation = builder.create_observation(simulation_result[0], current_selection, *simulation_result[1:])
+    for key in observation:
+        np.testing.assert_array_equal(timed_observation[key], observation[key])
+
+    session = timed_builder.start_session()
+    session.append(current_selection[0], [])
+    summary = timings.summary()
+    # Статичные группы - по разу на builder, пошаговые - на create_observation, reset и append сессии
+    assert summary["time_windows"]["calls"] == 1
+    assert summary["static_pairwise"]["calls"] == 1
+    for group in ("executed_requests", "unfinished_ratio", "current_selection", "next_request_tw", "pairwise", "output"):
+        assert summary[group]["calls"] == 3
+        assert summary[group]["total_s"] >= 0.0
@@ -9,6 +9,7 @@ from src.optimizer.main import SimulatorEnv
 from src.optimizer.settings import GENERATOR_SETTINGS, DEFAULT_OBSERVATION_FEATURES
 from src.simulator.environment import Environment
 from src.simulator.model.simulator import Simulator
+from src.simulator.units.truck import Truck, Position
 from src.simulator.utils.data_generator.generator import InputDataGenerator
 
 
@@ -49,6 +50,78 @@ def test_simulator_run(simulator: Simulator, environment: Environment, requests_
                        for req_constr in requests_constraints])
 
 
+def test_simulator_session_matches_full_run(
+        simulator: Simulator,
+        environment: Environment,
+        requests_constraints: list[list[int]]
+):
+    rng = random.Random(0)
+    for _ in range(5):
+        selection = [rng.choice(req_constr) for req_constr in requests_constraints]
+        session = simulator.start_session()
+        for request_id, truck_id in enumerate(selection):
+            session_missed, session_positions, session_times = session.append(truck_id)
+            run_missed, run_positions, run_times = simulator.run(tuple(selection[:request_id + 1]))
+
+            assert sorted(session_missed) == sorted(run_missed)
+            assert [point.name for point in session_positions] == [point.name for point in run_positions]
+            assert session_times == run_times
+
+
+def test_simulator_trace_matches_run(
+        simulator: Simulator,
+        environment: Environment,
+        requests_constraints: list[list[int]]
+):
+    rng = random.Random(5)
+    selection = tuple(rng.choice(req_constr + [-1]) for req_constr in requests_constraints)
+    missed, positions, times = simulator.run(selection)
+
+    traced_missed, traced_positions, traced_times, trace = simulator.run_with_trace(selection)
+
+    assert traced_missed == missed
+    assert [point.name for point in traced_positions] == [point.name for point in positions]
+    assert traced_times == times
+    assert trace.truck_ids.tolist() == list(selection)
+    assert sorted(np.flatnonzero(~trace.served).tolist()) == sorted(missed)
+
+    window_starts = environment.compiled.request_window_starts
+    served = trace.served
+    assert np.all(trace.slacks[served] >= 0)
+    assert np.all(trace.slacks[(trace.truck_ids != -1) & ~served] < 0)
+    np.testing.assert_array_equal(trace.slacks[served], window_starts[served] - trace.load_arrival_times[served])
+    assert np.all(trace.departure_times[served] <= trace.load_arrival_times[served])
+    assert np.all(trace.load_arrival_times[served] <= trace.load_end_times[served])
+    assert np.all(trace.load_end_times[served] <= trace.unload_end_times[served])
+    for truck_id, truck_time in enumerate(times):
+        truck_served = served & (trace.truck_ids == truck_id)
+        assert truck_time == (trace.unload_end_times[truck_served].max() if truck_served.any() else 0)
+
+
+def test_simulator_run_does_not_copy_or_change_trucks(
+        simulator: Simulator,
+        environment: Environment,
+        requests_constraints: list[list[int]],
+        monkeypatch: pytest.MonkeyPatch
+):
+    start_point_names = [truck.position.current_point.name for truck in environment.trucks]
+
+    def forbidden_model_copy(*args, **kwargs):
+        raise AssertionError("Simulator.run не должен копировать pydantic-модели")
+
+    monkeypatch.setattr(Truck, "model_copy", forbidden_model_copy)
+    monkeypatch.setattr(Position, "model_copy", forbidden_model_copy)
+
+    rng = random.Random(3)
+    missed_requests_ids, truck_positions, _ = simulator.run(
+        tuple(rng.choice(req_constr) for req_constr in requests_constraints)
+    )
+
+    assert len(missed_requests_ids) <= environment.requests_num
+    assert len(truck_positions) == len(environment.trucks)
+    assert [truck.position.current_point.name for truck in environment.trucks] == start_point_names
+
+
 def _assert_observation_is_valid(rl_env: SimulatorEnv, observation: dict) -> None:
     assert rl_env.observation_space.contains(observation)
     expected_pairwise_shape = (
@@ -101,7 +174,7 @@ def test_rl_env_masked_episode_smoke(rl_env: SimulatorEnv):
 
         allowed_actions = np.flatnonzero(action_mask)
         allowed_truck_ids = set(allowed_actions - 1)
-        expected_allowed_truck_ids = set(rl_env._current_requests_constrains[current_request_id])
+        expected_allowed_truck_ids = set(rl_env._current_env.constraints.get_allowed_trucks(with_missed=True)[current_request_id])
         assert allowed_truck_ids == expected_allowed_truck_ids
 
         action = int(random.choice(allowed_actions))
@@ -138,20 +211,20 @@ def test_reward_uses_previous_observation_slack(rl_env: SimulatorEnv, monkeypatc
     truck_available_times = [0] * len(rl_env._current_env.trucks)
 
     monkeypatch.setattr(
-        rl_env._simulator,
-        "run",
-        lambda selection, env: ([], truck_positions, truck_available_times)
+        rl_env._simulation_session,
+        "append",
+        lambda truck_id: ([], truck_positions, truck_available_times)
     )
 
-    original_create_observation = rl_env._obs_builder.create_observation
+    original_append_observation = rl_env._obs_session.append
 
-    def fake_create_observation(*args, **kwargs):
-        next_observation = original_create_observation(*args, **kwargs)
+    def fake_append_observation(*args, **kwargs):
+        next_observation = original_append_observation(*args, **kwargs)
         next_observation["earliness_to_window_start"][0][truck_id] = np.float32(0.0)
         next_observation["lateness_to_window_start"][0][truck_id] = np.float32(1.0)
         return next_observation
 
-    monkeypatch.setattr(rl_env._obs_builder, "create_observation", fake_create_observation)
+    monkeypatch.setattr(rl_env._obs_session, "append", fake_append_observation)
 
     _, reward, _, truncated, _ = rl_env.step(action)
 
@@ -186,9 +259,9 @@ def test_reward_is_positive_for_successful_assignment(rl_env: SimulatorEnv, monk
     truck_positions = [truck.position.current_point.model_copy(deep=True) for truck in rl_env._current_env.trucks]
     truck_available_times = [0] * len(rl_env._current_env.trucks)
     monkeypatch.setattr(
-        rl_env._simulator,
-        "run",
-        lambda selection, env: ([], truck_positions, truck_available_times)
+        rl_env._simulation_session,
+        "append",
+        lambda truck_id: ([], truck_positions, truck_available_times)
     )
 
     _, reward, _, truncated, info = rl_env.step(action)
@@ -198,25 +271,35 @@ def test_reward_is_positive_for_successful_assignment(rl_env: SimulatorEnv, monk
     assert info["missed_requests_num"] == 0
 
 
-def test_rl_env_step_runs_simulator_once(rl_env: SimulatorEnv):
+def test_rl_env_step_advances_simulation_session_once(rl_env: SimulatorEnv):
     rl_env.reset(seed=42)
+    original_append = rl_env._simulation_session.append
     original_run = rl_env._simulator.run
-    calls_num = 0
+    append_calls_num = 0
+    run_calls_num = 0
+
+    def counting_append(*args, **kwargs):
+        nonlocal append_calls_num
+        append_calls_num += 1
+        return original_append(*args, **kwargs)
 
     def counting_run(*args, **kwargs):
-        nonlocal calls_num
-        calls_num += 1
+        nonlocal run_calls_num
+        run_calls_num += 1
         return original_run(*args, **kwargs)
 
+    rl_env._simulation_session.append = counting_append
     rl_env._simulator.run = counting_run
     try:
         action_mask = rl_env.action_masks()
         action = int(np.flatnonzero(action_mask)[0])
         observation, reward, terminated, truncated, info = rl_env.step(action)
     finally:
+        rl_env._simulation_session.append = original_append
         rl_env._simulator.run = original_run
 
-    assert calls_num == 1
+    assert append_calls_num == 1
+    assert run_calls_num == 0
     _assert_observation_is_valid(rl_env, observation)
     _assert_reward_is_valid(reward)
     assert truncated is False
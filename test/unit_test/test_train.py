@@ -1,9 +1,11 @@
 import json
+import tracemalloc
 from dataclasses import replace
 from pathlib import Path
 
 import pytest
 import numpy as np
+from gymnasium import spaces
 
 from src.optimizer.train import EarlyStoppingCallback
 from src.optimizer.train import EpisodeLoggerCallback
@@ -12,12 +14,20 @@ from src.optimizer.train import build_fixed_instances
 from src.optimizer.train import build_training_metadata
 from src.optimizer.train import build_piecewise_schedule
 from src.optimizer.train import build_env
+from src.optimizer.train import build_model
 from src.optimizer.train import get_observation_feature_config
 from src.optimizer.train import load_or_build_model
 from src.optimizer.train import quarter_decay_schedule
 from src.optimizer.train import save_training_metadata
 from src.optimizer.train import serialize_train_config
 from src.optimizer.settings import DEFAULT_OBSERVATION_FEATURES
+from src.optimizer.utils.compact_policy import CompactCombinedExtractor, CompactDictRolloutBuffer
+from src.optimizer.utils.observation_encoding import (
+    QUANTIZED_KEYS,
+    dequantize,
+    get_compact_selection_dtype,
+    get_quantization_scale,
+)
 
 
 class DummyLogger:
@@ -90,6 +100,25 @@ def test_episode_logger_callback_logs_only_completed_episode_metrics() -> None:
     assert callback.logger.records["train/learning_rate"] == pytest.approx(7e-4)
 
 
+def test_observation_timings_are_exported_to_info_and_logger() -> None:
+    env = build_env(DEFAULT_OBSERVATION_FEATURES, seed=5, profile_observations=True)
+    _, reset_info = env.reset(seed=5)
+    _, _, _, _, info = env.step(0)
+
+    # Каждый шаг - ровно один замер пошаговых групп
+    assert info["observation_timings"]["pairwise"]["calls"] == reset_info["observation_timings"]["pairwise"]["calls"] + 1
+    assert "observation_timings" not in build_env(DEFAULT_OBSERVATION_FEATURES, seed=5).reset(seed=5)[1]
+
+    callback = EpisodeLoggerCallback()
+    callback.model = DummyModel()
+    callback.locals = {"infos": [info], "dones": [True]}
+    callback._on_step()
+    assert callback.logger.records["observation_timing/pairwise_mean_us"] == pytest.approx(
+        info["observation_timings"]["pairwise"]["mean_us"]
+    )
+    assert "observation_timing/time_windows_total_s" in callback.logger.records
+
+
 def test_quarter_decay_schedule_switches_learning_rate_by_quarters() -> None:
     assert quarter_decay_schedule(1.0) == pytest.approx(3e-3)
     assert quarter_decay_schedule(0.75) == pytest.approx(3e-3)
@@ -317,3 +346,54 @@ def test_load_or_build_model_loads_checkpoint_and_sets_env(monkeypatch) -> None:
     assert model is loaded_model
     assert loaded_paths == ["output/models/checkpoint.zip"]
     assert env_markers == [env]
+
+
+def test_compact_observations_are_decoded_by_policy_and_stored_compactly() -> None:
+    feature_config = get_observation_feature_config("all", compact_encoding=True)
+    env = build_env(feature_config, seed=7)
+    observation, _ = env.reset(seed=7)
+    assert env.observation_space.contains(observation)
+    assert observation["current_selection"].dtype == get_compact_selection_dtype()
+    assert observation["travel_time_to_load"].dtype == np.uint16
+
+    float_env = build_env(DEFAULT_OBSERVATION_FEATURES, seed=7)
+    float_observation, _ = float_env.reset(seed=7)
+    scale = get_quantization_scale(feature_config)
+    for key in QUANTIZED_KEYS:
+        np.testing.assert_allclose(dequantize(observation[key], feature_config), float_observation[key], atol=0.5 / scale)
+
+    config = _build_train_config(
+        n_steps=16,
+        verbose=0,
+        observation_feature_config=feature_config,
+    )
+    model = build_model(config, env)
+    assert isinstance(model.policy.features_extractor, CompactCombinedExtractor)
+    # Логи TensorBoard в тесте не нужны
+    model.tensorboard_log = None
+    model.learn(total_timesteps=16)
+    assert model.rollout_buffer.observations["travel_time_to_load"].dtype == np.uint16
+    assert model.rollout_buffer.observations["current_selection"].dtype == get_compact_selection_dtype()
+
+
+def test_compact_rollout_buffer_does_not_allocate_float_observations() -> None:
+    observation_space = spaces.Dict({"travel_time_to_load": spaces.Box(0, 255, shape=(4096,), dtype=np.uint8)})
+    buffer_size = 64
+    float_observations_nbytes = buffer_size * 4096 * np.dtype(np.float32).itemsize
+
+    tracemalloc.start()
+    try:
+        rollout_buffer = CompactDictRolloutBuffer(buffer_size, observation_space, spaces.Discrete(3))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert rollout_buffer.observations["travel_time_to_load"].dtype == np.uint8
+    assert rollout_buffer.obs_shape == {"travel_time_to_load": (4096,)}
+    assert peak < float_observations_nbytes
+
+
+def test_compact_selection_dtype_fits_all_truck_ids() -> None:
+    assert get_compact_selection_dtype(128) == np.int8
+    assert get_compact_selection_dtype(129) == np.int16
+    assert get_compact_selection_dtype(40_000) == np.int32